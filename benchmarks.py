@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the ``url_breadcrumbs`` template tag.
+
+Times three separate costs across path depths, with and without
+``request.crumbs`` overrides, and with different numbers of crumb name
+functions:
+
+ - ``trail`` : building the list of crumbs
+ - ``render`` : rendering already built crumbs with the template
+ - ``render_python`` : rendering already built crumbs without the template
+   engine
+ - ``tag`` : rendering ``{% url_breadcrumbs request %}`` end to end
+
+and the cost of converting a corpus of path fragments into fallback crumb
+names, without the name cache:
+
+ - ``humanize/legacy`` : the former ``re_spacify`` and ``title`` filter path
+ - ``humanize/table`` : :class:`url_breadcrumbs.names.Humanizer`
+
+and, each in a fresh interpreter, the time and memory taken to import:
+
+ - ``import/core`` : the Django-independent :mod:`url_breadcrumbs.core`
+ - ``import/django`` : the template tags, including configuring Django
+
+Results are written as JSON, and can be compared against the results of an
+earlier run to catch regressions::
+
+    python benchmarks.py --output before.json
+    python benchmarks.py --compare before.json
+
+Also runnable as ``python runtests.py --benchmark [options]``.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import runtests  # noqa, configures Django settings
+
+DEPTHS = (1, 2, 5, 10, 20, 50)
+FUNCTION_COUNTS = (0, 1, 5, 10)
+
+# Path fragments as found on a typical site
+HUMANIZE_CORPUS = (
+    ['section-%d_item' % i for i in range(50)] +
+    ['about-us', 'news', '2024', 'faq', 'contact_us', 'our-team',
+     'annual-report_2023', "visitor's-guide", 'what-s-on', 'collection',
+     'exhibitions', 'past+exhibitions', 'education', 'shop', 'api'])
+
+
+def _noop_crumb_fn(context, request, path_fragment, is_current_page):
+    return None
+
+
+def _cases():
+    for depth in DEPTHS:
+        for with_crumbs in (False, True):
+            for fn_count in FUNCTION_COUNTS:
+                yield depth, with_crumbs, fn_count
+
+
+def _time(fn, number, repeat):
+    # Best of ``repeat`` runs, in microseconds per call
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) \
+        / number * 1e6
+
+
+def run_benchmarks(number=200, repeat=5):
+    from django.template import Context, Template
+    from django.test.client import RequestFactory
+    from django.test.utils import override_settings
+
+    from url_breadcrumbs.templatetags.url_breadcrumbs_tags import (
+        render_crumbs, url_breadcrumbs)
+    from url_breadcrumbs.trails import build_crumbs
+
+    request_factory = RequestFactory()
+    template = Template(
+        "{% load url_breadcrumbs_tags %}{% url_breadcrumbs request %}")
+    results = []
+    for depth, with_crumbs, fn_count in _cases():
+        slugs = ['section-%d_item' % i for i in range(depth)]
+        request = request_factory.get('/%s/' % '/'.join(slugs))
+        if with_crumbs:
+            request.crumbs = dict(
+                (slug, 'Name %d' % i) for i, slug in enumerate(slugs[::2]))
+        fns = [_noop_crumb_fn] * fn_count
+        with override_settings(URL_BREADCRUMBS_FUNCTIONS=fns):
+            context = Context({'request': request})
+            crumb_context = url_breadcrumbs(context, request)
+            # Rendering needs a context bound to a template
+            render_context = Context({'request': request})
+            render_context.template = template
+            timings = {
+                'trail': _time(
+                    lambda: build_crumbs(context, request, 'Home'),
+                    number, repeat),
+                'render': _time(
+                    lambda: render_crumbs(render_context, crumb_context),
+                    number, repeat),
+                'render_python': _time(
+                    lambda: render_crumbs(render_context, crumb_context,
+                                          renderer='python'),
+                    number, repeat),
+                'tag': _time(
+                    lambda: template.render(context), number, repeat),
+            }
+        for measure, usec in sorted(timings.items()):
+            results.append({
+                'name': '%s/depth=%d/crumbs=%s/functions=%d' % (
+                    measure, depth, int(with_crumbs), fn_count),
+                'measure': measure,
+                'depth': depth,
+                'request_crumbs': with_crumbs,
+                'functions': fn_count,
+                'usec_per_call': round(usec, 3),
+            })
+    results.extend(run_humanize_benchmarks(number, repeat))
+    results.extend(run_import_benchmarks(repeat))
+    return {
+        'python': platform.python_version(),
+        'django': __import__('django').get_version(),
+        'settings': {'number': number, 'repeat': repeat},
+        'results': results,
+    }
+
+
+def run_humanize_benchmarks(number, repeat):
+    from django.template.defaultfilters import title
+
+    from url_breadcrumbs.names import Humanizer, re_spacify
+
+    humanizer = Humanizer()
+    timings = {
+        'legacy': _time(
+            lambda: [title(re_spacify.sub(' ', fragment))
+                     for fragment in HUMANIZE_CORPUS],
+            number, repeat),
+        'table': _time(
+            lambda: [humanizer(fragment) for fragment in HUMANIZE_CORPUS],
+            number, repeat),
+    }
+    return [{
+        'name': 'humanize/%s' % implementation,
+        'measure': 'humanize',
+        'fragments': len(HUMANIZE_CORPUS),
+        'usec_per_call': round(usec, 3),
+    } for implementation, usec in sorted(timings.items())]
+
+
+IMPORTS = {
+    'core': 'import url_breadcrumbs.core',
+    'django': 'import runtests, url_breadcrumbs.templatetags.'
+              'url_breadcrumbs_tags',
+}
+
+_IMPORT_SCRIPT = '''
+import json, sys, time, tracemalloc
+if sys.argv[1] == 'memory':
+    tracemalloc.start()
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'usec': elapsed * 1e6,
+    'kib': tracemalloc.get_traced_memory()[0] / 1024.0,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+def run_import_benchmarks(repeat):
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    with tempfile.TemporaryDirectory() as pycache:
+        # Cache bytecode so imports are not timed compiling source
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+        def measure(statement, mode):
+            output = subprocess.check_output(
+                [sys.executable, '-c', _IMPORT_SCRIPT % statement, mode],
+                cwd=here, env=env)
+            return json.loads(output.decode('utf-8'))
+
+        for target, statement in sorted(IMPORTS.items()):
+            measure(statement, 'time')
+            usec = min(measure(statement, 'time')['usec']
+                       for _ in range(repeat))
+            memory = measure(statement, 'memory')
+            results.append({
+                'name': 'import/%s' % target,
+                'measure': 'import',
+                'usec_per_call': round(usec, 3),
+                'kib_allocated': round(memory['kib'], 1),
+                'modules': memory['modules'],
+            })
+    return results
+
+
+def compare(baseline, current, threshold):
+    """
+    Return a list of ``(name, before, after)`` for results that are slower
+    than ``baseline`` by more than the ``threshold`` fraction.
+    """
+    before = dict((r['name'], r['usec_per_call'])
+                  for r in baseline['results'])
+    regressions = []
+    for result in current['results']:
+        old = before.get(result['name'])
+        new = result['usec_per_call']
+        if old and new > old * (1 + threshold):
+            regressions.append((result['name'], old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--number', type=int, default=200,
+                        help='calls per timing run')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timing runs, the best is reported')
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='fractional slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    data = run_benchmarks(number=args.number, repeat=args.repeat)
+    output = json.dumps(data, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    elif not args.compare:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, data, args.threshold)
+        for name, old, new in regressions:
+            print('REGRESSION %s: %.1fus -> %.1fus (%+.0f%%)'
+                  % (name, old, new, (new / old - 1) * 100))
+        print('%d of %d benchmarks regressed by more than %d%%'
+              % (len(regressions), len(data['results']),
+                 args.threshold * 100))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,7 @@
 import sys
 import logging
 
+import django
 from django.conf import settings
 
 
@@ -20,9 +21,14 @@ if not settings.configured:
         INSTALLED_APPS=(
             'url_breadcrumbs',
         ),
+        TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'APP_DIRS': True,
+        }],
         SITE_ID=1,
         SECRET_KEY='secret_key',
     )
+    django.setup()
 
 
 from django.test.utils import get_runner
@@ -36,4 +42,8 @@ def runtests():
 
 
 if __name__ == '__main__':
+    if '--benchmark' in sys.argv[1:]:
+        import benchmarks
+        sys.argv.remove('--benchmark')
+        sys.exit(benchmarks.main(sys.argv[1:]))
     runtests()
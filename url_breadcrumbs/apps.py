@@ -0,0 +1,25 @@
+from django.apps import AppConfig
+from django.core.signals import setting_changed
+
+
+class UrlBreadcrumbsConfig(AppConfig):
+    name = 'url_breadcrumbs'
+    verbose_name = 'URL Breadcrumbs'
+
+    def ready(self):
+        from url_breadcrumbs import (
+            i18n, index, instrumentation, names, pipeline, trails)
+        from url_breadcrumbs.templatetags import url_breadcrumbs_tags
+        # Fail fast on invalid URL_BREADCRUMBS_FUNCTIONS
+        pipeline.load_pipeline()
+        setting_changed.connect(pipeline.setting_changed_receiver)
+        instrumentation.configure()
+        setting_changed.connect(instrumentation.setting_changed_receiver)
+        i18n.configure()
+        setting_changed.connect(i18n.setting_changed_receiver)
+        names.configure()
+        setting_changed.connect(names.setting_changed_receiver)
+        trails.configure()
+        setting_changed.connect(trails.setting_changed_receiver)
+        setting_changed.connect(index.setting_changed_receiver)
+        setting_changed.connect(url_breadcrumbs_tags.setting_changed_receiver)
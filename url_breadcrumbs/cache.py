@@ -0,0 +1,332 @@
+"""
+Caching helpers used by the
+:mod:`url_breadcrumbs.templatetags.url_breadcrumbs_tags` template tag.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A thread-safe, size-bounded mapping that evicts the least recently used
+    entry once ``maxsize`` entries are stored.
+
+    Hit, miss and eviction counts are kept so the effectiveness of the cache
+    can be monitored, see :meth:`stats`. A ``maxsize`` of zero disables the
+    cache: nothing is stored and every lookup is a miss.
+
+    Entries may be given a ``timeout`` in seconds, after which they are
+    treated as missing.
+    """
+
+    def __init__(self, maxsize=1024):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._maxsize = max(int(maxsize), 0)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, value):
+        with self._lock:
+            self._maxsize = max(int(value), 0)
+            self._evict()
+
+    def _evict(self):
+        # Caller must hold the lock
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout=None):
+        if not self._maxsize:
+            return
+        expires = None if timeout is None else time.time() + timeout
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return a dict of the cache's counters and current size."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self._maxsize,
+        }
+
+
+def get_backend(backend, maxsize=1024):
+    """
+    Return a cache object for ``backend``: a new :class:`LRUCache` holding up
+    to ``maxsize`` entries if ``backend`` is ``'memory'``, otherwise the Django
+    cache with the alias ``backend``.
+    """
+    if backend == 'memory':
+        return LRUCache(maxsize)
+    from django.core.cache import caches
+    return caches[backend]
+
+
+class TrailCache(object):
+    """
+    Cache of whole breadcrumb trails keyed by request path.
+
+    Trails are stored in process memory when ``backend`` is ``'memory'``,
+    otherwise ``backend`` names a cache alias from Django's ``CACHES``
+    setting, such as a locmem or file-based cache.
+
+    Each path maps to a dict of trails keyed by the home crumb name and
+    language, so :meth:`invalidate` can drop every trail for a path at once.
+
+    :meth:`invalidate_prefix` drops the trails of a path and all its
+    descendants when the name of a crumb changes. With the ``'memory'``
+    backend, cached paths are indexed by each of their prefixes to find
+    them. At most four times ``maxsize`` paths are indexed, and the trails
+    of the least recently cached path are dropped along with its index
+    entries, so no trail outlives its invalidation.
+
+    In a Django cache, which other processes share, each path prefix has a
+    generation counter stored alongside the trails, and the key of a path's
+    trails includes the generations of all its prefixes. Invalidating a
+    prefix increments its generation, so the trails of every path under it,
+    cached by any process, are no longer found and are left to expire or be
+    evicted by the cache.
+
+    Args:
+     - ``backend`` (str): ``'memory'`` or a Django cache alias
+     - ``timeout`` (int): default lifetime of entries in seconds, ``None``
+       to keep entries until evicted or invalidated
+     - ``timeouts`` (dict): maps path prefixes to the timeout of entries
+       under that prefix, the longest matching prefix wins
+     - ``maxsize`` (int): number of paths held by the ``'memory'`` backend
+    """
+    key_prefix = 'url_breadcrumbs:trail:'
+
+    def __init__(self, backend='memory', timeout=None, timeouts=None,
+                 maxsize=1024):
+        self.backend = backend
+        self.timeout = timeout
+        self.timeouts = sorted((timeouts or {}).items(),
+                               key=lambda item: len(item[0]), reverse=True)
+        self._cache = get_backend(backend, maxsize)
+        # Maps each crumb path prefix to the set of cached paths under it
+        self._dependents = {}
+        # Paths indexed in _dependents, least recently cached first
+        self._indexed = OrderedDict()
+        self._max_indexed = 4 * maxsize
+        self._lock = threading.Lock()
+
+    def _digest(self, value):
+        # Hash keys to keep them short and safe for memcached-like backends
+        return hashlib.md5(
+            value.encode('utf-8'), usedforsecurity=False).hexdigest()
+
+    def _generation_key(self, prefix):
+        return self.key_prefix + 'generation:' + self._digest(prefix)
+
+    def _generations(self, path):
+        keys = [self._generation_key(prefix)
+                for prefix in self._prefixes(path)]
+        found = self._cache.get_many(keys)
+        return [str(found.get(key, 0)) for key in keys]
+
+    def _key(self, path):
+        if self.backend == 'memory':
+            return path
+        return self.key_prefix + self._digest(
+            '\0'.join([path] + self._generations(path)))
+
+    def timeout_for(self, path):
+        """Return the timeout of trails cached for ``path``."""
+        for prefix, timeout in self.timeouts:
+            if path.startswith(prefix):
+                return timeout
+        return self.timeout
+
+    def get(self, path, crumb_home_name, language=None):
+        """Return the cached trail, or ``None`` if there is none."""
+        trails = self._cache.get(self._key(path))
+        if trails is None:
+            return None
+        if language is not None:
+            return trails.get((crumb_home_name, language))
+        return trails.get(crumb_home_name)
+
+    def set(self, path, crumb_home_name, crumbs, language=None):
+        key = self._key(path)
+        trails = dict(self._cache.get(key) or {})
+        if language is not None:
+            crumb_home_name = (crumb_home_name, language)
+        trails[crumb_home_name] = list(crumbs)
+        self._cache.set(key, trails, timeout=self.timeout_for(path))
+        if self.backend == 'memory':
+            self._index(path)
+
+    @staticmethod
+    def _prefixes(path):
+        yield '/'
+        prefix = ''
+        for path_fragment in path.split('/'):
+            if path_fragment:
+                prefix = '%s/%s' % (prefix, path_fragment)
+                yield prefix
+
+    def _index(self, path):
+        evicted = []
+        with self._lock:
+            if path in self._indexed:
+                self._indexed.move_to_end(path)
+                return
+            self._indexed[path] = None
+            for prefix in self._prefixes(path):
+                self._dependents.setdefault(prefix, set()).add(path)
+            while len(self._indexed) > self._max_indexed:
+                old_path = self._indexed.popitem(last=False)[0]
+                self._unindex(old_path)
+                evicted.append(old_path)
+        # Drop trails that invalidate_prefix could no longer find
+        for old_path in evicted:
+            self.invalidate(old_path)
+
+    def _unindex(self, path):
+        # Caller must hold the lock
+        for prefix in self._prefixes(path):
+            paths = self._dependents.get(prefix)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self._dependents[prefix]
+
+    def invalidate(self, path):
+        """Remove all trails cached for ``path``."""
+        self._cache.delete(self._key(path))
+
+    def invalidate_prefix(self, prefix):
+        """
+        Remove all trails cached for the crumb path ``prefix``, such as
+        ``'/about/team'``, and for every path under it. Returns the number of
+        paths removed, or ``None`` with a Django cache backend, where the
+        trails of all paths under ``prefix`` are invalidated at once.
+        """
+        prefix = '/' + '/'.join(p for p in prefix.split('/') if p)
+        if self.backend != 'memory':
+            key = self._generation_key(prefix)
+            self._cache.add(key, 0, timeout=None)
+            try:
+                self._cache.incr(key)
+            except ValueError:
+                # Evicted since it was added
+                self._cache.set(key, 1, timeout=None)
+            return None
+        with self._lock:
+            paths = list(self._dependents.get(prefix, ()))
+            for path in paths:
+                self._unindex(path)
+                del self._indexed[path]
+        for path in paths:
+            self.invalidate(path)
+        return len(paths)
+
+    def clear(self):
+        """
+        Remove all cached trails. With a Django cache backend this clears the
+        whole cache alias, so configure a dedicated alias for trails.
+        """
+        with self._lock:
+            self._dependents.clear()
+            self._indexed.clear()
+        self._cache.clear()
+
+
+class HtmlCache(object):
+    """
+    Cache of rendered breadcrumb HTML.
+
+    Keys are digests of everything that affects the rendered output: the
+    crumbs, delimiter, template name and source, and autoescaping. They are
+    further versioned by this package's version and the ``version`` argument,
+    so entries are not reused after an upgrade, template edit or a deploy
+    that changes the version.
+
+    Args:
+     - ``backend`` (str): ``'memory'`` or a Django cache alias
+     - ``timeout`` (int): lifetime of entries in seconds, ``None`` to keep
+       entries until evicted
+     - ``version``: extra key version, such as a deploy identifier
+     - ``maxsize`` (int): number of entries held by the ``'memory'`` backend
+    """
+    key_prefix = 'url_breadcrumbs:html:'
+
+    def __init__(self, backend='memory', timeout=None, version=None,
+                 maxsize=1024):
+        from url_breadcrumbs import __version__
+        self.backend = backend
+        self.timeout = timeout
+        self.version = '%s:%s' % (__version__, version or '')
+        self._cache = get_backend(backend, maxsize)
+
+    def make_key(self, template_name, template_source, crumbs, crumb_delim,
+                 autoescape=True, language=None):
+        digest = hashlib.md5(usedforsecurity=False)
+        for part in (self.version, template_name, template_source,
+                     repr(crumb_delim), repr(bool(autoescape)),
+                     language or ''):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        for crumb in crumbs:
+            digest.update(repr(tuple(crumb)).encode('utf-8'))
+        return self.key_prefix + digest.hexdigest()
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, html):
+        self._cache.set(key, html, timeout=self.timeout)
+
+    def clear(self):
+        """
+        Remove all cached HTML. With a Django cache backend this clears the
+        whole cache alias, so configure a dedicated alias for breadcrumbs.
+        """
+        self._cache.clear()
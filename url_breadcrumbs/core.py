@@ -0,0 +1,901 @@
+"""
+Breadcrumb trail engine independent of Django.
+
+This module only imports the Python standard library, so offline workers and
+command line tools can split URL paths into crumbs and name them without
+importing or configuring Django. All configuration is passed explicitly in a
+:class:`TrailConfig`::
+
+    from url_breadcrumbs.core import CrumbIndex, TrailConfig, build_trail
+
+    config = TrailConfig(
+        crumb_functions=[my_crumb_fn],
+        crumb_index=CrumbIndex({'/about-us': 'About'}))
+    trail = build_trail('/about-us/team', config)
+
+Crumb name functions follow the protocols described in
+:mod:`url_breadcrumbs.crumb_fns`, with a ``request`` of ``None`` and
+whatever ``context`` is passed in.
+
+:mod:`url_breadcrumbs.trails` and the template tags are adapters that build
+a :class:`TrailConfig` from Django settings and add caching, translation and
+instrumentation.
+"""
+import contextvars
+import hashlib
+import logging
+import re
+import threading
+import time
+
+from url_breadcrumbs.cache import LRUCache
+
+log = logging.getLogger(__name__)
+
+
+# Crumb name function protocol markers, see url_breadcrumbs.crumb_fns
+
+def context_independent(fn):
+    """
+    Mark a crumb name function as returning the same result for a given path
+    fragment regardless of the context and request it is called with.
+    """
+    fn.crumb_context_independent = True
+    return fn
+
+
+def batched(fn):
+    """
+    Mark a crumb name function as using the batched protocol, i.e. naming all
+    the path fragments of a trail in one call.
+    """
+    fn.crumb_batched = True
+    return fn
+
+
+def io_bound(fn):
+    """
+    Mark a crumb name function as waiting on I/O, so it is run concurrently
+    in a shared thread pool.
+    """
+    fn.crumb_io_bound = True
+    return fn
+
+
+def is_context_independent(fn):
+    return getattr(fn, 'crumb_context_independent', False)
+
+
+def is_batched(fn):
+    return getattr(fn, 'crumb_batched', False)
+
+
+def is_io_bound(fn):
+    return getattr(fn, 'crumb_io_bound', False)
+
+
+# Paths
+
+def split_path(path):
+    return [p for p in path.split('/') if p]
+
+
+class Item(object):
+    """
+    A path segment of a trail being named, which unpacks like the
+    ``(crumb_path, path_fragment, is_current_page)`` tuple it stands for.
+
+    An item holds the full path of its trail and the offset of the end of
+    its crumb path within it. The crumb path is only sliced from the full
+    path when first used, for example by a batched function, so trails named
+    from their path fragments alone never copy the path of every prefix.
+    """
+    __slots__ = ('source', 'start', 'end', 'path_fragment', 'is_current_page',
+                 '_path')
+
+    def __init__(self, source, start, end, path_fragment, is_current_page):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.path_fragment = path_fragment
+        self.is_current_page = is_current_page
+        self._path = None
+
+    @classmethod
+    def from_tuple(cls, item):
+        crumb_path, path_fragment, is_current_page = item
+        end = len(crumb_path)
+        item = cls(crumb_path, end - len(path_fragment), end, path_fragment,
+                   is_current_page)
+        item._path = crumb_path
+        return item
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = self.source[:self.end]
+        return self._path
+
+    def __iter__(self):
+        yield self.path
+        yield self.path_fragment
+        yield self.is_current_page
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (Item, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return 'Item(%r, %r, %r)' % tuple(self)
+
+
+def prefix_items(slug_items):
+    """
+    Return an :class:`Item` for each of the ``slug_items`` path segments.
+    Items share a single joined path and hold offsets into it, rather than
+    each holding a copy of its crumb path.
+    """
+    source = '/' + '/'.join(slug_items)
+    last = len(slug_items) - 1
+    items = []
+    end = 0
+    for i, path_fragment in enumerate(slug_items):
+        start = end + 1
+        end = start + len(path_fragment)
+        items.append(Item(source, start, end, path_fragment, i == last))
+    return items
+
+
+# Crumb index
+
+class _Node(object):
+    __slots__ = ('children', 'name')
+
+    def __init__(self):
+        self.children = None
+        self.name = None
+
+
+class CrumbIndex(object):
+    """
+    Trie mapping URL paths to crumb names.
+
+    A name of ``''`` hides the crumb for that path, ``None`` means the path
+    has no known name.
+    """
+
+    def __init__(self, mapping=None):
+        self._root = _Node()
+        self._size = 0
+        if mapping:
+            self.update(mapping)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+    @classmethod
+    def from_queryset(cls, queryset, path_field='path', name_field='title'):
+        """
+        Build an index from a Django queryset with path and name fields.
+        Rows are streamed with ``QuerySet.iterator()`` to avoid caching the
+        whole queryset.
+        """
+        index = cls()
+        for path, name in queryset.values_list(
+                path_field, name_field).iterator():
+            index.insert(path, name)
+        return index
+
+    @classmethod
+    def from_fixture(cls, filename):
+        """
+        Build an index from a JSON file holding either an object mapping paths
+        to names or a list of ``{"path": ..., "name": ...}`` objects.
+        """
+        import json
+        with open(filename) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return cls(data)
+        return cls((item['path'], item['name']) for item in data)
+
+    def update(self, mapping):
+        """Insert names from a dict or iterable of ``(path, name)`` pairs."""
+        items = mapping.items() if hasattr(mapping, 'items') else mapping
+        for path, name in items:
+            self.insert(path, name)
+
+    def insert(self, path, name):
+        if name is None:
+            raise ValueError("Crumb name for %r cannot be None" % path)
+        node = self._root
+        for segment in split_path(path):
+            if node.children is None:
+                node.children = {}
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _Node()
+            node = child
+        if node.name is None:
+            self._size += 1
+        node.name = name
+
+    def delete(self, path):
+        """
+        Remove the name for ``path``, pruning trie nodes left empty. Names of
+        descendant paths are kept. Raises ``KeyError`` if ``path`` has no name.
+        """
+        segments = split_path(path)
+        node = self._root
+        parents = []
+        for segment in segments:
+            child = node.children and node.children.get(segment)
+            if child is None:
+                raise KeyError(path)
+            parents.append((node, segment))
+            node = child
+        if node.name is None:
+            raise KeyError(path)
+        node.name = None
+        self._size -= 1
+        # Prune nodes that no longer hold a name or children
+        for parent, segment in reversed(parents):
+            child = parent.children[segment]
+            if child.name is not None or child.children:
+                break
+            del parent.children[segment]
+
+    def get(self, path, default=None):
+        slug_items = split_path(path)
+        if not slug_items:
+            # The root path is named by the root node
+            name = self._root.name
+            return default if name is None else name
+        names = self.walk(slug_items)
+        if len(names) != len(slug_items) or names[-1] is None:
+            return default
+        return names[-1]
+
+    def walk(self, slug_items):
+        """
+        Return the names of each successive prefix of the ``slug_items`` path
+        segments, with ``None`` for prefixes with no name. The returned list is
+        shorter than ``slug_items`` if the trie holds no deeper prefixes.
+        """
+        names = []
+        node = self._root
+        for segment in slug_items:
+            children = node.children
+            if not children:
+                break
+            node = children.get(segment)
+            if node is None:
+                break
+            names.append(node.name)
+        return names
+
+
+# Fallback names
+
+DEFAULT_SEPARATORS = '-_+'
+
+# Fragments that identify a record rather than name it: numbers, UUIDs and
+# long hex digests
+re_identifier = re.compile(
+    r'^(?:\d+'
+    r'|[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}'
+    r'|(?=[a-fA-F]*\d)[0-9a-fA-F]{12,})$')
+
+# Fixes for str.title() as applied by Django's title filter
+re_title_apostrophe = re.compile(r"([a-z])'([A-Z])")
+re_title_digit = re.compile(r'\d([A-Z])')
+
+
+def _lower_match(match):
+    return match.group(0).lower()
+
+
+def _title(text):
+    # Same result as Django's title filter, skipping its fixes when they
+    # don't apply
+    text = text.title()
+    if "'" in text:
+        text = re_title_apostrophe.sub(_lower_match, text)
+    if re_title_digit.search(text):
+        text = re_title_digit.sub(_lower_match, text)
+    return text
+
+
+class Humanizer(object):
+    """
+    Convert URL path fragments into human-friendly crumb names, replacing
+    separators with a translation table and looking words up in one table of
+    acronyms and stop words, e.g. ``'faq-for_the-api'`` becomes
+    ``'FAQ for the API'`` with ``acronyms=['API', 'FAQ']`` and
+    ``stop_words=['for', 'the']``.
+
+    Without acronyms, overrides or stop words, names match those of Django's
+    ``title`` filter applied to the fragment with separators replaced by
+    spaces, except that with ``keep_identifiers`` fragments that look like
+    identifiers are left as they are, so ``'d41d8cd98f00b204e980'`` is not
+    written as ``'D41d8cd98f00b204e980'``.
+
+    Args:
+     - ``separators`` (str): characters that separate words in fragments
+     - ``acronyms``: words to always write as given, e.g. ``'API'`` or
+       ``'iOS'``, matched case-insensitively
+     - ``overrides`` (dict): exact names for whole path fragments
+     - ``stop_words``: words kept in lowercase, except as the first word
+     - ``keep_identifiers`` (bool): leave fragments that look like numbers,
+       UUIDs or hex digests as they are
+    """
+
+    def __init__(self, separators=DEFAULT_SEPARATORS, acronyms=None,
+                 overrides=None, stop_words=None, keep_identifiers=True):
+        self.separators = separators
+        self.table = str.maketrans(separators, ' ' * len(separators))
+        # One lookup table of exact spellings by lowercased word, in which
+        # acronyms take precedence over stop words
+        self.words = dict((w.lower(), w.lower()) for w in stop_words or ())
+        self.words.update((w.lower(), w) for w in acronyms or ())
+        self.stop_words = frozenset(
+            w.lower() for w in stop_words or ()).difference(
+                w.lower() for w in acronyms or ())
+        self.overrides = dict(overrides or {})
+        self.keep_identifiers = keep_identifiers
+
+    def __call__(self, path_fragment):
+        name = self.overrides.get(path_fragment)
+        if name is not None:
+            return name
+        if self.keep_identifiers and (
+                path_fragment.isdigit() or (
+                    len(path_fragment) >= 12 and
+                    re_identifier.match(path_fragment))):
+            return path_fragment
+        text = path_fragment.translate(self.table)
+        if not self.words:
+            return _title(text)
+        # Look up each word's exact spelling, else use its title case
+        get = self.words.get
+        words = text.lower().split(' ')
+        names = [get(word) or titled for word, titled in
+                 zip(words, _title(text).split(' '))]
+        # Stop words are capitalized when they start the name
+        if words[0] in self.stop_words:
+            names[0] = names[0].capitalize()
+        return ' '.join(names)
+
+
+# Trails
+
+class Crumb(object):
+    """
+    A crumb of a breadcrumb trail, which unpacks like the
+    ``(crumb_path, path_fragment, crumb_name)`` tuple it stands for.
+
+    Rather than holding its own copies of the crumb path and path fragment,
+    a crumb holds the full path of its trail and the offsets of its fragment
+    within it, so all crumbs of a trail share one path string. Each is
+    sliced at most once, when first used, unless ``path_fragment`` or
+    ``path`` are given. Pickled crumbs only hold the shared path.
+    """
+    __slots__ = ('source', 'start', 'end', 'name', '_path', '_path_fragment')
+
+    def __init__(self, source, start, end, name, path_fragment=None,
+                 path=None):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.name = name
+        self._path_fragment = path_fragment
+        self._path = path
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = self.source[:self.end]
+        return self._path
+
+    @property
+    def path_fragment(self):
+        if self._path_fragment is None:
+            self._path_fragment = self.source[self.start:self.end]
+        return self._path_fragment
+
+    def __iter__(self):
+        # Unpacked for every crumb rendered, so avoid the property calls
+        path = self._path
+        if path is None:
+            path = self._path = self.source[:self.end]
+        path_fragment = self._path_fragment
+        if path_fragment is None:
+            path_fragment = self._path_fragment = (
+                self.source[self.start:self.end])
+        return iter((path, path_fragment, self.name))
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (Crumb, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return 'Crumb(%r, %r, %r)' % tuple(self)
+
+    def __getstate__(self):
+        return (self.source, self.start, self.end, self.name)
+
+    def __setstate__(self, state):
+        self.source, self.start, self.end, self.name = state
+        self._path = self._path_fragment = None
+
+
+class Trail(list):
+    """
+    List of the :class:`Crumb` objects of a breadcrumb trail, with the full
+    path shared by the crumbs as ``path``.
+
+    ``degraded`` is ``True`` if the time budget for building the trail ran
+    out, so some crumbs fell back to names derived from their path fragments.
+    """
+    __slots__ = ('path', 'degraded')
+
+    def __init__(self, path, crumbs=(), degraded=False):
+        super(Trail, self).__init__(crumbs)
+        self.path = path
+        self.degraded = degraded
+
+    def __reduce__(self):
+        return (Trail, (self.path, list(self), self.degraded))
+
+
+def trail_fingerprint(crumbs, crumb_delim='&raquo;'):
+    """
+    Return a hex digest of the crumb paths and names of ``crumbs`` and the
+    ``crumb_delim`` rendered between them, which is the same in every
+    process for the same breadcrumb output. Path fragments are implied by
+    the paths, so are not included.
+    """
+    digest = hashlib.md5(crumb_delim.encode('utf-8'),
+                         usedforsecurity=False)
+    for crumb_path, _, crumb_name in crumbs:
+        digest.update(b'\0')
+        digest.update(crumb_path.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(str(crumb_name).encode('utf-8'))
+    return digest.hexdigest()
+
+
+# Naming
+
+class BudgetExceeded(Exception):
+    """Raised when the time budget for naming a trail's crumbs is spent."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(max_workers=8):
+    """
+    Return the thread pool shared by all I/O-bound crumb name functions,
+    created with up to ``max_workers`` threads on first use.
+    """
+    global _executor
+    if _executor is None:
+        # Imported on first use, most trails never need the pool
+        from concurrent.futures import ThreadPoolExecutor
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix='url_breadcrumbs')
+    return _executor
+
+
+def _call(fn, *args):
+    return fn(*args)
+
+
+def submit_io_bound_functions(crumb_functions, context, request, items,
+                              io_workers=8, pool_call=None):
+    """
+    Start calling each I/O-bound function in ``crumb_functions`` in the
+    shared thread pool, once for ``items`` if batched or else once per item.
+
+    Functions run with a copy of the caller's context variables, through
+    ``pool_call(fn, *args)`` if given.
+
+    Returns a dict mapping each batched function, and each ``(function,
+    crumb_path)`` pair of other functions, to the future of its result.
+    """
+    futures = {}
+    executor = None
+    if pool_call is None:
+        pool_call = _call
+    for fn in crumb_functions:
+        if not is_io_bound(fn):
+            continue
+        if executor is None:
+            executor = get_executor(io_workers)
+        if is_batched(fn):
+            futures[fn] = executor.submit(
+                contextvars.copy_context().run, pool_call,
+                fn, context, request, items)
+        else:
+            for crumb_path, path_fragment, is_current_page in items:
+                futures[fn, crumb_path] = executor.submit(
+                    contextvars.copy_context().run, pool_call,
+                    fn, context, request, path_fragment, is_current_page)
+    return futures
+
+
+def _check_budget(fn, deadline, on_degraded):
+    if deadline is not None and time.perf_counter() >= deadline:
+        if on_degraded is not None:
+            on_degraded(fn)
+        raise BudgetExceeded(fn)
+
+
+def _result(fn, future, deadline, on_degraded):
+    # Wait for the result of an I/O-bound function until the deadline
+    from concurrent.futures import TimeoutError as FutureTimeoutError
+    timeout = None
+    if deadline is not None:
+        timeout = max(0, deadline - time.perf_counter())
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        if on_degraded is not None:
+            on_degraded(fn)
+        raise BudgetExceeded(fn)
+
+
+def call_batched_functions(crumb_functions, context, request, items,
+                           futures=None, deadline=None, on_degraded=None):
+    """
+    Call each batched function in ``crumb_functions`` once with ``items``, a
+    list of ``(crumb_path, path_fragment, is_current_page)`` tuples.
+
+    Returns a dict mapping each batched function to the dict of crumb names
+    by crumb path that it returned. Functions that raise an exception are
+    logged and ignored. Functions that could not finish before ``deadline``
+    map to ``None``, and are passed to ``on_degraded`` if given.
+
+    Results of I/O-bound functions are taken from ``futures``, as returned by
+    :func:`submit_io_bound_functions`.
+    """
+    batch_results = {}
+    for fn in crumb_functions:
+        if not is_batched(fn):
+            continue
+        try:
+            if futures and fn in futures:
+                result = _result(fn, futures[fn], deadline, on_degraded)
+            else:
+                _check_budget(fn, deadline, on_degraded)
+                result = fn(context, request, items)
+            batch_results[fn] = result or {}
+        except BudgetExceeded:
+            batch_results[fn] = None
+        except:
+            # Error in crumb name generation function
+            log.warn("Batched crumb generation function %s failed"
+                     % fn, exc_info=True)
+    return batch_results
+
+
+def call_crumb_functions(crumb_functions, context, request, path_fragment,
+                         is_current_page, crumb_path=None,
+                         batch_results=None, futures=None, deadline=None,
+                         on_win=None, on_degraded=None):
+    """
+    Return the first non-``None`` crumb name returned by ``crumb_functions``,
+    or ``None`` if no function names the path fragment. Functions that raise
+    an exception are logged and ignored.
+
+    Names from batched functions are looked up by ``crumb_path`` in
+    ``batch_results``, as returned by :func:`call_batched_functions`, and
+    names from I/O-bound functions are taken from ``futures``.
+
+    Raises :class:`BudgetExceeded` if a function has not named the path
+    fragment by ``deadline``, a :func:`time.perf_counter` value, rather than
+    consulting later functions. That way the name chosen never depends on
+    which functions happen to finish first.
+
+    ``on_win`` and ``on_degraded`` are called with the function that named
+    the path fragment, or that ran out of time, if given.
+    """
+    for fn in crumb_functions:
+        if is_batched(fn):
+            if not batch_results or fn not in batch_results:
+                continue
+            if batch_results[fn] is None:
+                raise BudgetExceeded(fn)
+            crumb_name = batch_results[fn].get(crumb_path)
+        else:
+            try:
+                if futures and (fn, crumb_path) in futures:
+                    crumb_name = _result(
+                        fn, futures[fn, crumb_path], deadline, on_degraded)
+                else:
+                    _check_budget(fn, deadline, on_degraded)
+                    crumb_name = fn(context, request, path_fragment,
+                                    is_current_page)
+            except BudgetExceeded:
+                raise
+            except:
+                # Error in crumb name generation function
+                log.warn("Crumb generation function %s failed"
+                         % fn, exc_info=True)
+                continue
+        if crumb_name is not None:
+            if on_win is not None:
+                on_win(fn)
+            return crumb_name  # Pay attention to any non-None return value
+    return None
+
+
+class TrailConfig(object):
+    """
+    Explicit configuration of trail building, in place of Django settings.
+
+    Args:
+     - ``home_name`` (str): name of the root Home crumb
+     - ``crumb_functions``: crumb name functions, consulted in order
+     - ``crumb_index`` (:class:`CrumbIndex`): names of whole path prefixes,
+       which take priority over ``crumb_functions``
+     - ``fallback``: callable converting a path fragment into the name used
+       when no function names it, a :class:`Humanizer` by default
+     - ``time_budget`` (float): seconds crumb functions may take to name a
+       trail, ``None`` for no limit
+     - ``io_workers`` (int): threads in the pool shared by I/O-bound
+       functions, used when the pool is first created
+     - ``pool_call``: callable that calls I/O-bound functions in pool
+       threads as ``pool_call(fn, *args)``, for per-call setup and cleanup
+     - ``language_prefixes``: first path fragments that get no crumb, such
+       as the language codes of i18n URL patterns
+     - ``on_win``: callable called with each function that names a crumb
+     - ``on_degraded``: callable called with each function that runs out of
+       time budget
+    """
+
+    def __init__(self, home_name='Home', crumb_functions=(), crumb_index=None,
+                 fallback=None, time_budget=None, io_workers=8,
+                 pool_call=None, language_prefixes=(), on_win=None,
+                 on_degraded=None):
+        self.home_name = home_name
+        self.crumb_functions = tuple(crumb_functions or ())
+        self.crumb_index = crumb_index
+        self.fallback = fallback if fallback is not None else Humanizer()
+        self.time_budget = time_budget
+        self.io_workers = io_workers
+        self.pool_call = pool_call
+        self.language_prefixes = frozenset(
+            code.lower() for code in language_prefixes
+        ) if language_prefixes else frozenset()
+        self.on_win = on_win
+        self.on_degraded = on_degraded
+
+
+def name_crumbs(config, context, request, items, deadline=None,
+                degraded=None):
+    """
+    Return the crumb name for each :class:`Item`, or ``(crumb_path,
+    path_fragment, is_current_page)`` tuple, in ``items``, from the crumb
+    functions of ``config`` or else from its ``fallback``.
+
+    Batched functions are called once for all the items, and all functions
+    are consulted for each item in their configured order. Functions marked
+    with :func:`io_bound` are all started up front in a shared thread pool,
+    see :func:`get_executor`.
+
+    Items not named by ``deadline``, a :func:`time.perf_counter` value, fall
+    back to their ``fallback`` name, and their crumb paths are appended to
+    the ``degraded`` list if given.
+    """
+    crumb_functions = config.crumb_functions
+    items = [item if isinstance(item, Item) else Item.from_tuple(item)
+             for item in items]
+    futures = submit_io_bound_functions(
+        crumb_functions, context, request, items, config.io_workers,
+        config.pool_call)
+    batch_results = call_batched_functions(
+        crumb_functions, context, request, items, futures, deadline,
+        config.on_degraded)
+    fallback = config.fallback
+    # Crumb paths are only needed to look up batched and I/O-bound results
+    need_paths = bool(batch_results or futures)
+    names = []
+    for item in items:
+        try:
+            crumb_name = call_crumb_functions(
+                crumb_functions, context, request, item.path_fragment,
+                item.is_current_page, item.path if need_paths else None,
+                batch_results, futures, deadline, config.on_win,
+                config.on_degraded)
+        except BudgetExceeded as e:
+            log.warn("Crumb generation function %s ran out of time naming %s"
+                     % (e.args[0], item.path))
+            crumb_name = None
+            if degraded is not None:
+                degraded.append(item.path)
+        # Fallback strategy is to reformat the slug component to title
+        # case and hope this produces a human-friendly crumb name...
+        if crumb_name is None:
+            crumb_name = fallback(item.path_fragment)
+        names.append(crumb_name)
+    # Don't start calls whose results are no longer needed
+    for future in futures.values():
+        future.cancel()
+    return names
+
+
+_unset = object()
+
+
+def split_trail(path, crumb_index=None, crumb=_unset, crumbs=None,
+                language_prefixes=()):
+    """
+    Split ``path`` into the items of its breadcrumb trail.
+
+    Returns the tuple ``(items, names, pending)`` where ``items`` holds an
+    :class:`Item` for each path fragment, ``names`` holds the crumb name of
+    each item set by ``crumb``, ``crumbs`` or ``crumb_index``, and
+    ``pending`` lists the indexes of items that still need a name.
+
+    ``crumb`` names the current page's crumb and ``crumbs`` maps path
+    fragments to names, as ``request.crumb`` and ``request.crumbs`` do. A
+    first path fragment in ``language_prefixes`` gets no crumb.
+    """
+    # Split current URL path into component path items
+    slug_items = split_path(path)
+    # Names of path prefixes known to the crumb index, if any
+    index_names = crumb_index.walk(slug_items) if crumb_index else []
+    items = prefix_items(slug_items)
+    names = []
+    # Indexes of items without an explicit crumb name
+    pending = []
+    for i, item in enumerate(items, 1):
+        path_fragment = item.path_fragment
+        crumb_name = None
+        # Language prefixes of i18n URL patterns get no crumb
+        if (i == 1 and language_prefixes and
+                path_fragment.lower() in language_prefixes):
+            crumb_name = ''
+        # crumb string overrides name of current page's crumb
+        elif item.is_current_page and crumb is not _unset:
+            crumb_name = crumb
+        # crumbs dict overrides names of arbitrary crumbs
+        elif crumbs is not None and path_fragment in crumbs:
+            crumb_name = crumbs.get(path_fragment)
+        # Crumb index names whole path prefixes
+        elif i <= len(index_names) and index_names[i - 1] is not None:
+            crumb_name = index_names[i - 1]
+        else:
+            # No explicit crumb name provided yet.
+            pending.append(i - 1)
+        names.append(crumb_name)
+    return items, names, pending
+
+
+def join_trail(crumb_home_name, items, names):
+    """
+    Return the :class:`Trail` of crumbs for named ``items``, as returned by
+    :func:`split_trail`, starting with the root Home crumb and skipping items
+    with no name.
+    """
+    # Crumbs share the full path of the items
+    source = items[-1].source if items else '/'
+    # Always include root/Home path
+    trail = Trail(source, [Crumb('/', 0, 1, crumb_home_name)])
+    for item, crumb_name in zip(items, names):
+        # If no crumb name, skip crumb entry
+        if not crumb_name:
+            continue
+        trail.append(Crumb(source, item.start, item.end, crumb_name,
+                           item.path_fragment, item._path))
+    return trail
+
+
+def build_trail(path, config=None, context=None, request=None, crumb=_unset,
+                crumbs=None, degraded=None):
+    """
+    Return the :class:`Trail` of ``(crumb_path, path_fragment, crumb_name)``
+    crumbs for ``path``, configured by ``config``, a :class:`TrailConfig`.
+
+    ``context`` and ``request`` are passed to crumb name functions, and
+    ``crumb`` and ``crumbs`` override crumb names, see :func:`split_trail`.
+    Crumbs not named within the time budget fall back to their ``fallback``
+    name, their paths are appended to the ``degraded`` list if given, and
+    the trail is marked as ``degraded``.
+    """
+    if config is None:
+        config = TrailConfig()
+    deadline = None
+    if config.time_budget is not None:
+        deadline = time.perf_counter() + config.time_budget
+    items, names, pending = split_trail(
+        path, config.crumb_index, crumb, crumbs, config.language_prefixes)
+    if degraded is None:
+        degraded = []
+    # Ask crumb functions for the remaining crumb names, falling back to
+    # title-cased path fragments
+    if pending:
+        pending_names = name_crumbs(config, context, request,
+                                    [items[i] for i in pending],
+                                    deadline, degraded)
+        for i, crumb_name in zip(pending, pending_names):
+            names[i] = crumb_name
+    trail = join_trail(config.home_name, items, names)
+    trail.degraded = bool(degraded)
+    return trail
+
+
+def build_trails(paths, config=None, crumbs=None, context=None,
+                 memo_size=10000, crumb=_unset):
+    """
+    Generate a ``(path, trail)`` pair for each of ``paths``, where ``trail``
+    is a tuple of :class:`Crumb` objects built as by :func:`build_trail`
+    with a ``request`` of ``None``. Paths are consumed lazily, so very large
+    iterables of paths can be processed.
+
+    Names of ancestor crumbs are computed once and shared between paths with
+    a common prefix, so ``/a/b/c`` and ``/a/b/d`` name ``/a`` and ``/a/b``
+    only once. Up to ``memo_size`` crumb names are remembered.
+    """
+    if config is None:
+        config = TrailConfig()
+    if context is None:
+        context = {}
+    memo = LRUCache(memo_size)
+    for path in paths:
+        items, names, pending = split_trail(
+            path, config.crumb_index, crumb, crumbs, config.language_prefixes)
+        # Only items not named by a crumb name function before still need one
+        unnamed = []
+        for i in pending:
+            crumb_name = memo.get((items[i].path, items[i].is_current_page))
+            if crumb_name is None:
+                unnamed.append(i)
+            else:
+                names[i] = crumb_name
+        if unnamed:
+            unnamed_names = name_crumbs(config, context, None,
+                                        [items[i] for i in unnamed])
+            for i, crumb_name in zip(unnamed, unnamed_names):
+                names[i] = crumb_name
+                memo.set((items[i].path, items[i].is_current_page),
+                         crumb_name or '')
+        yield path, tuple(join_trail(config.home_name, items, names))
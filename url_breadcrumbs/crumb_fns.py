@@ -5,7 +5,9 @@ Helper functions for the
 Configure the template tag to call these helper functions, or functions of
 your own, by defining ``URL_BREADCRUMBS_FUNCTIONS`` in your Django 
 :mod:`django.conf.settings` and setting the value to a list of one or more
-callables.
+callables, or dotted paths to callables. The setting is validated when the app
+is loaded and an invalid value raises
+:class:`~django.core.exceptions.ImproperlyConfigured`.
 
 Each callable in the ``URL_BREADCRUMBS_FUNCTIONS`` setting must accept three
 arguments:
@@ -20,7 +22,39 @@ The callables must return one of the following:
  - ``None`` if they do not wish to set the crumb name
  - Empty string if the path fragment should not appear in the breadcrumb
  - String name for the crumb representing the path fragment
+
+Callables that can name many path fragments more cheaply at once, for example
+with one database query, can instead use the batched protocol by being marked
+with the :func:`batched` decorator. Batched callables are called once per
+breadcrumb trail and must accept three arguments:
+
+ - context : the template context
+ - request : the current request, or ``None`` outside of a request
+ - items (list): a ``(crumb_path, path_fragment, is_current_page)`` tuple
+   for each path fragment that needs a crumb name, where ``crumb_path`` is
+   the URL path of the crumb such as ``'/about/team'``
+
+Batched callables must return a dict mapping crumb paths to crumb names, with
+the same meaning as the return values above; missing paths are treated as
+``None``. Batched and per-fragment callables are consulted in the order they
+are listed in ``URL_BREADCRUMBS_FUNCTIONS``.
+
+Callables whose result depends only on the path fragment and
+``is_current_page``, never on the context or request, should be marked with
+the :func:`context_independent` decorator. This allows whole breadcrumb
+trails to be cached by request path, see ``URL_BREADCRUMBS_TRAIL_CACHE``.
+
+Callables that spend most of their time waiting on I/O, such as database or
+HTTP requests, can be marked with the :func:`io_bound` decorator. They are
+then started for all path fragments at once in a shared thread pool, and are
+subject to the ``URL_BREADCRUMBS_TIME_BUDGET`` setting like other callables.
+I/O-bound callables must be thread-safe.
+
+The protocol markers are defined in :mod:`url_breadcrumbs.core`, so crumb
+name functions can be marked without importing Django.
 """
+from url_breadcrumbs.core import (  # noqa
+    batched, context_independent, io_bound, is_context_independent)
 
 
 def feincms_page_title(context, request, path_fragment, is_current_page):
@@ -37,3 +71,236 @@ def feincms_page_title(context, request, path_fragment, is_current_page):
     # If no titled FeinCMS page is available leave template tag to figure out
     # an appropriate crumb name
     return None
+
+
+class PageTreeTitles(object):
+    """
+    Crumb name function naming the current page and all its ancestors from
+    the titles of pages in a FeinCMS-style page tree, where each page stores
+    its full URL path in a field such as FeinCMS's ``_cached_url``.
+
+    This is a :func:`batched` function. The titles of every page along the
+    path are fetched in one query and cached per path for ``timeout``
+    seconds. Cached titles are discarded sooner whenever a page of the model
+    is saved or deleted, which bumps the model's page tree version. Set
+    ``URL_BREADCRUMBS_PAGE_TREE_CACHE`` to the alias of a cache shared by
+    all processes, such as memcached, to share versions between processes
+    so a save in one discards the titles cached by all of them.
+
+    Use an instance in the ``URL_BREADCRUMBS_FUNCTIONS`` setting::
+
+        URL_BREADCRUMBS_FUNCTIONS = [PageTreeTitles('page.Page')]
+
+    Args:
+     - ``model``: page model class, or its ``'app_label.ModelName'`` label
+     - ``url_field`` (str): field holding a page's URL path, which is
+       expected to end with a slash like ``/about/team/``
+     - ``title_field`` (str): field holding a page's title
+     - ``queryset``: optional queryset to restrict the pages considered,
+       such as only active pages
+     - ``cache_size`` (int): number of paths for which titles are cached
+     - ``timeout`` (int): seconds titles are cached for, ``None`` to cache
+       them until the page tree version changes
+    """
+    crumb_batched = True
+
+    def __init__(self, model=None, url_field='_cached_url',
+                 title_field='title', queryset=None, cache_size=1024,
+                 timeout=300):
+        from url_breadcrumbs.cache import LRUCache
+        if model is None and queryset is not None:
+            model = queryset.model
+        self._model = model
+        self._connected = False
+        self.url_field = url_field
+        self.title_field = title_field
+        self.queryset = queryset
+        self.cache = LRUCache(cache_size)
+        self.timeout = timeout
+
+    @property
+    def model(self):
+        if not self._connected:
+            if isinstance(self._model, str):
+                from django.apps import apps
+                self._model = apps.get_model(self._model)
+            connect_page_tree_signals(self._model)
+            self._connected = True
+        return self._model
+
+    def __repr__(self):
+        model = self._model
+        if model is not None and not isinstance(model, str):
+            model = model._meta.label
+        return '%s(%r)' % (type(self).__name__, model)
+
+    def get_queryset(self):
+        if self.queryset is not None:
+            return self.queryset.all()
+        return self.model._default_manager.all()
+
+    def titles_for_path(self, path):
+        """
+        Return a dict mapping each prefix of ``path`` that is a page, like
+        ``'/about/team'``, to the page title.
+        """
+        model = self.model
+        key = (page_tree_version(model), path)
+        titles = self.cache.get(key)
+        if titles is None:
+            urls = {}
+            prefix = ''
+            for path_fragment in path.split('/'):
+                if path_fragment:
+                    prefix = '%s/%s' % (prefix, path_fragment)
+                    urls[prefix + '/'] = prefix
+            titles = {}
+            if urls:
+                lookup = {'%s__in' % self.url_field: list(urls)}
+                for url, title in self.get_queryset().filter(
+                        **lookup).values_list(self.url_field,
+                                              self.title_field):
+                    titles[urls[url]] = title
+            self.cache.set(key, titles, timeout=self.timeout)
+        return titles
+
+    def __call__(self, context, request, items):
+        if not items:
+            return {}
+        # The path of the last item is the deepest, use it as the cache key
+        return self.titles_for_path(items[-1][0])
+
+
+# Page tree versions, keyed by model and bumped when any page changes
+_page_tree_versions = {}
+
+
+def _shared_versions():
+    # Cache shared by all processes holding page tree versions, if any
+    from django.conf import settings
+    alias = getattr(settings, 'URL_BREADCRUMBS_PAGE_TREE_CACHE', None)
+    if alias is None:
+        return None
+    from django.core.cache import caches
+    return caches[alias]
+
+
+def _version_key(model):
+    return 'url_breadcrumbs:page_tree:%s' % model._meta.label
+
+
+def page_tree_version(model):
+    """
+    Return the page tree version of ``model``, from the
+    ``URL_BREADCRUMBS_PAGE_TREE_CACHE`` cache if that is set.
+    """
+    shared = _shared_versions()
+    if shared is not None:
+        return shared.get(_version_key(model), 0)
+    return _page_tree_versions.get(model, 0)
+
+
+def bump_page_tree_version(sender, **kwargs):
+    shared = _shared_versions()
+    if shared is not None:
+        key = _version_key(sender)
+        shared.add(key, 0, timeout=None)
+        try:
+            shared.incr(key)
+        except ValueError:
+            # Evicted since it was added
+            shared.set(key, 1, timeout=None)
+    else:
+        _page_tree_versions[sender] = page_tree_version(sender) + 1
+
+
+def connect_page_tree_signals(model):
+    """Bump the page tree version of ``model`` when a page changes."""
+    from django.db.models.signals import post_delete, post_save
+    uid = 'url_breadcrumbs.page_tree.%s' % model._meta.label
+    post_save.connect(bump_page_tree_version, sender=model, dispatch_uid=uid)
+    post_delete.connect(bump_page_tree_version, sender=model,
+                        dispatch_uid=uid)
+
+
+class UrlPatternNames(object):
+    """
+    Batched crumb name function naming crumbs from the metadata of the URL
+    patterns their paths resolve to, rather than guessing from path slugs.
+
+    A crumb's name is taken from a ``crumb`` entry in the extra keyword
+    arguments of its URL pattern, which may be a string or a callable that
+    accepts the :class:`~django.urls.ResolverMatch` and returns a name::
+
+        path('news/', news_index, {'crumb': 'Latest News'}),
+        path('news/<int:pk>/', news_item,
+             {'crumb': lambda match: Article.objects.get(
+                 pk=match.kwargs['pk']).title}),
+
+    Note that views receive the ``crumb`` keyword argument too.
+
+    Resolver matches for path prefixes are cached, so the URL resolver runs
+    once per distinct prefix rather than for every prefix of every request.
+    Paths are resolved with a trailing slash first, then without.
+
+    Args:
+     - ``use_url_name`` (bool): if ``True``, crumbs of patterns without a
+       ``crumb`` keyword argument are named from the humanized pattern name,
+       so ``'news-archive'`` becomes ``'News Archive'``
+     - ``skip_unresolved`` (bool): if ``True``, ancestor crumbs whose paths
+       do not resolve are hidden rather than linking to a missing page
+     - ``cache_size`` (int): number of resolved prefixes cached
+    """
+    crumb_batched = True
+
+    def __init__(self, use_url_name=False, skip_unresolved=False,
+                 cache_size=4096):
+        from url_breadcrumbs.cache import LRUCache
+        self.use_url_name = use_url_name
+        self.skip_unresolved = skip_unresolved
+        self.cache = LRUCache(cache_size)
+
+    def __repr__(self):
+        return '%s(use_url_name=%r, skip_unresolved=%r)' % (
+            type(self).__name__, self.use_url_name, self.skip_unresolved)
+
+    def resolve(self, crumb_path):
+        """
+        Return the :class:`~django.urls.ResolverMatch` of ``crumb_path``, or
+        ``False`` if it does not resolve.
+        """
+        from django.urls import Resolver404, get_urlconf, resolve
+        urlconf = get_urlconf()
+        key = (urlconf, crumb_path)
+        match = self.cache.get(key)
+        if match is None:
+            match = False
+            for candidate in (crumb_path.rstrip('/') + '/', crumb_path):
+                try:
+                    match = resolve(candidate, urlconf)
+                    break
+                except Resolver404:
+                    pass
+            self.cache.set(key, match)
+        return match
+
+    def name_for_match(self, match):
+        crumb = match.kwargs.get('crumb')
+        if callable(crumb):
+            crumb = crumb(match)
+        if crumb is None and self.use_url_name and match.url_name:
+            from url_breadcrumbs.names import slug_to_name
+            crumb = slug_to_name(match.url_name)
+        return crumb
+
+    def __call__(self, context, request, items):
+        names = {}
+        for crumb_path, path_fragment, is_current_page in items:
+            match = self.resolve(crumb_path)
+            if match:
+                name = self.name_for_match(match)
+                if name is not None:
+                    names[crumb_path] = name
+            elif self.skip_unresolved and not is_current_page:
+                names[crumb_path] = ''
+        return names
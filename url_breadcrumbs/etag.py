@@ -0,0 +1,72 @@
+"""
+Conditional GET support for pages showing breadcrumbs.
+
+Use :func:`trail_etag` with Django's
+:func:`~django.views.decorators.http.condition` decorator so a page's ETag
+changes whenever its breadcrumb trail does, letting unchanged pages return
+``304 Not Modified`` without running the view or rendering a template::
+
+    from django.views.decorators.http import condition
+    from url_breadcrumbs.etag import trail_etag
+
+    def article_etag(request, slug):
+        return Article.objects.get(slug=slug).modified.isoformat()
+
+    @condition(etag_func=trail_etag(article_etag))
+    def article(request, slug):
+        ...
+
+The trail is the one known before the view runs, built without a template
+context. Crumb names the view sets with ``request.crumb`` or
+``request.crumbs``, or that crumb functions take from the template context,
+are not included, so add their sources to your own ETag function. With
+:class:`~url_breadcrumbs.middleware.BreadcrumbsMiddleware` enabled, the page
+reuses the trail built for the ETag only if every crumb name function is
+marked :func:`~url_breadcrumbs.crumb_fns.context_independent`, otherwise the
+trail is built again with the page's template context.
+"""
+import functools
+
+from url_breadcrumbs.middleware import get_breadcrumbs
+
+
+def fold_etag(etag, fingerprint):
+    """
+    Return ``etag``, quoted or not and weak or strong, with ``fingerprint``
+    appended to its opaque value, as a quoted ETag of the same strength.
+    """
+    weak = etag.startswith('W/')
+    if weak:
+        etag = etag[2:]
+    if len(etag) >= 2 and etag[0] == etag[-1] == '"':
+        etag = etag[1:-1]
+    return '%s"%s-%s"' % ('W/' if weak else '', etag, fingerprint)
+
+
+def trail_etag(etag_func=None, crumb_delim='&raquo;', crumb_home_name='Home'):
+    """
+    Return an ETag function for Django's ``condition`` decorator that folds
+    the fingerprint of the request's breadcrumb trail into the ETag returned
+    by ``etag_func``, see :func:`~url_breadcrumbs.trails.trail_fingerprint`.
+
+    Args:
+     - ``etag_func``: function accepting the view's arguments and returning
+       the ETag of the rest of the page, or ``None`` if the page has no
+       ETag. If omitted, the trail fingerprint alone is the ETag.
+     - ``crumb_delim`` (str): the delimiter the page renders between crumbs
+     - ``crumb_home_name`` (str): the name the page gives the Home crumb
+    """
+    def get_etag(request, *args, **kwargs):
+        etag = None
+        if etag_func is not None:
+            etag = etag_func(request, *args, **kwargs)
+            if etag is None:
+                return None
+        fingerprint = get_breadcrumbs(request).fingerprint(
+            crumb_delim, crumb_home_name)
+        if etag is None:
+            return '"%s"' % fingerprint
+        return fold_etag(etag, fingerprint)
+    if etag_func is not None:
+        get_etag = functools.wraps(etag_func)(get_etag)
+    return get_etag
@@ -0,0 +1,38 @@
+"""
+Rendering of breadcrumb HTML without the Django template engine.
+
+:func:`render_html` produces exactly the same markup as the default
+``url_breadcrumbs.html`` template, for pages where template rendering
+overhead matters. It cannot reflect a customized ``url_breadcrumbs.html``
+template, so only use it with the default markup.
+"""
+from django.utils.html import conditional_escape, strip_spaces_between_tags
+from django.utils.safestring import mark_safe
+
+
+def render_html(crumbs, crumb_delim, autoescape=True):
+    """
+    Return the breadcrumb HTML for ``crumbs``, as rendered by the default
+    template. As in that template, crumb paths and names are escaped if
+    ``autoescape`` is on, but ``crumb_delim`` is trusted and never escaped,
+    and whitespace between tags is removed as by ``{% spaceless %}``, even
+    within names and ``crumb_delim``.
+    """
+    if autoescape:
+        escape = conditional_escape
+    else:
+        escape = str
+    parts = ['<ul class="url-breadcrumbs">']
+    last = len(crumbs) - 1
+    for i, (path, path_fragment, name) in enumerate(crumbs):
+        if i != last:
+            parts.append(
+                '<li class="crumb"><a href="%s">%s</a>'
+                '<span class="crumb-delim">%s</span></li>'
+                % (escape(path), escape(name), crumb_delim))
+        else:
+            parts.append(
+                '<li class="crumb"><span class="crumb-final">%s</span></li>'
+                % escape(name))
+    parts.append('</ul>')
+    return mark_safe(strip_spaces_between_tags(''.join(parts)) + '\n')
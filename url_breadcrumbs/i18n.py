@@ -0,0 +1,110 @@
+"""
+Optional translation of crumb names into the active language.
+
+Enable translation by setting ``URL_BREADCRUMBS_I18N = True`` in Django
+settings. When enabled:
+
+ - the Home crumb name and fallback crumb names generated from path
+   fragments are looked up with :func:`~django.utils.translation.gettext`,
+   so add msgids such as ``"Home"`` or ``"About Us"`` to your catalogs
+ - fallback crumb names are cached separately for each language, see
+   :func:`url_breadcrumbs.names.slug_to_name`, and cached trails and HTML are
+   keyed by language
+ - if the root URLconf uses :func:`~django.conf.urls.i18n.i18n_patterns`,
+   a first path fragment that is the language prefix it adds, as found by
+   :func:`~django.utils.translation.get_language_from_path`, gets no crumb
+   of its own
+
+Names returned by crumb functions, ``request.crumb`` and ``request.crumbs``
+are used as given, so translate them where they are produced.
+
+When disabled, naming only pays for a check of :data:`enabled`.
+"""
+from django.conf import settings
+from django.conf.urls.i18n import is_language_prefix_patterns_used
+from django.utils import translation
+
+#: ``True`` if crumb names are translated
+enabled = False
+
+_language_codes = None
+# Whether the root URLconf uses i18n_patterns, found when first needed
+_prefix_patterns_used = None
+
+
+def get_language():
+    """Return the active language code, or ``None`` if not enabled."""
+    if not enabled:
+        return None
+    return translation.get_language()
+
+
+def gettext(name):
+    """Return ``name`` translated into the active language, if enabled."""
+    if not enabled or not name:
+        return name
+    return translation.gettext(name)
+
+
+def prefix_patterns_used():
+    """
+    Return ``True`` if translation is enabled and the root URLconf uses
+    :func:`~django.conf.urls.i18n.i18n_patterns` to prefix paths with a
+    language code.
+    """
+    global _prefix_patterns_used
+    if not enabled:
+        return False
+    if _prefix_patterns_used is None:
+        urlconf = getattr(settings, 'ROOT_URLCONF', None)
+        _prefix_patterns_used = urlconf is not None and (
+            is_language_prefix_patterns_used(urlconf)[0])
+    return _prefix_patterns_used
+
+
+def get_language_prefixes():
+    """
+    Return the lowercased language codes in the ``LANGUAGES`` setting if
+    :func:`prefix_patterns_used`, otherwise an empty set.
+    """
+    global _language_codes
+    if not prefix_patterns_used():
+        return frozenset()
+    if _language_codes is None:
+        _language_codes = frozenset(
+            code.lower() for code, _ in settings.LANGUAGES)
+    return _language_codes
+
+
+def get_path_language_prefixes(path):
+    """
+    Return a set holding the lowercased first fragment of ``path`` if it is
+    the language prefix added by :func:`~django.conf.urls.i18n.i18n_patterns`,
+    otherwise an empty set.
+    """
+    if not prefix_patterns_used():
+        return frozenset()
+    if translation.get_language_from_path(path) is None:
+        return frozenset()
+    return frozenset([path.split('/', 2)[1].lower()])
+
+
+def is_language_prefix(path_fragment):
+    """
+    Return ``True`` if ``path_fragment`` is a language prefix added by
+    :func:`~django.conf.urls.i18n.i18n_patterns` when it starts a path, see
+    :func:`get_path_language_prefixes`.
+    """
+    return bool(get_path_language_prefixes('/%s/' % path_fragment))
+
+
+def configure():
+    """Enable or disable translation from Django settings."""
+    global enabled, _language_codes, _prefix_patterns_used
+    enabled = bool(getattr(settings, 'URL_BREADCRUMBS_I18N', False))
+    _language_codes = _prefix_patterns_used = None
+
+
+def setting_changed_receiver(setting, **kwargs):
+    if setting in ('URL_BREADCRUMBS_I18N', 'LANGUAGES', 'ROOT_URLCONF'):
+        configure()
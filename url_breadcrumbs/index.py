@@ -0,0 +1,52 @@
+"""
+A prefix trie of known crumb names, keyed by URL path segments.
+
+Where ``request.crumbs`` and crumb name functions name a bare path fragment,
+a :class:`CrumbIndex` stores the canonical name for a whole path prefix, so
+``/shop/books`` and ``/library/books`` can be named differently. All crumb
+names for a request path are found in a single walk down the trie.
+
+Configure the ``url_breadcrumbs`` template tag to consult an index by setting
+``URL_BREADCRUMBS_INDEX`` in Django settings to a :class:`CrumbIndex`, or a
+dotted path to one or to a callable returning one. Changes made to the index
+after trails are cached are not seen until those trails are invalidated.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+# The index itself doesn't depend on Django
+from url_breadcrumbs.core import CrumbIndex, split_path  # noqa
+
+
+_missing = object()
+_source = _missing
+_index = None
+
+
+def get_crumb_index():
+    """
+    Return the :class:`CrumbIndex` configured by ``URL_BREADCRUMBS_INDEX``,
+    or ``None`` if there is none. The setting is resolved when first used and
+    again when it changes.
+    """
+    global _source, _index
+    if _source is _missing:
+        source = getattr(settings, 'URL_BREADCRUMBS_INDEX', None)
+        index = source
+        if isinstance(index, str):
+            index = import_string(index)
+        if callable(index) and not isinstance(index, CrumbIndex):
+            index = index()
+        if index is not None and not isinstance(index, CrumbIndex):
+            raise ImproperlyConfigured(
+                "URL_BREADCRUMBS_INDEX in settings is invalid, it must be a"
+                " CrumbIndex: %r" % source)
+        _source, _index = source, index
+    return _index
+
+
+def setting_changed_receiver(setting, **kwargs):
+    global _source, _index
+    if setting == 'URL_BREADCRUMBS_INDEX':
+        _source, _index = _missing, None
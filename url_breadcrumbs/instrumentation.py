@@ -0,0 +1,260 @@
+"""
+Optional timing and failure instrumentation of breadcrumb trail building.
+
+Enable instrumentation by setting ``URL_BREADCRUMBS_INSTRUMENTATION = True``
+in Django settings, or by calling :func:`enable`. When enabled, the following
+are recorded for each crumb name function:
+
+ - number of calls and of calls that raised an exception
+ - cumulative and percentile call latency
+ - number of crumb names the function provided, i.e. "won"
+ - number of times the trail time budget ran out waiting for the function
+
+along with the number of trails built, how many ran out of time budget, and
+their cumulative and percentile build time. Read these with :func:`get_stats`.
+
+Statistics are kept per function, so two instances of a crumb name function
+class are counted separately. Give a function a ``crumb_label`` attribute to
+choose the name it is reported under, see :func:`function_label`.
+
+The :data:`~url_breadcrumbs.signals.crumb_function_called` and
+:data:`~url_breadcrumbs.signals.trail_built` signals are also sent, so timings
+can be forwarded to a metrics service such as statsd or Prometheus::
+
+    from url_breadcrumbs.signals import trail_built
+
+    @receiver(trail_built)
+    def send_trail_timing(sender, path, duration, **kwargs):
+        statsd.timing('breadcrumbs.trail', duration * 1000)
+
+When disabled, trail building only pays for a check of :data:`enabled`.
+"""
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from url_breadcrumbs import signals
+
+#: ``True`` if instrumentation is enabled
+enabled = False
+
+# Number of most recent latencies kept to compute percentiles
+SAMPLE_SIZE = 1024
+
+_lock = threading.Lock()
+# Maps the label of each instrumented function to its Timings
+_function_stats = {}
+_wrappers = {}
+# Unique label of each instrumented function
+_labels = {}
+
+
+class Timings(object):
+    """Call count, cumulative time and recent latencies of an operation."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.wins = 0
+        self.degraded = 0
+        self.total_time = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def record(self, duration, error=False):
+        with _lock:
+            self.calls += 1
+            self.total_time += duration
+            self.samples.append(duration)
+            if error:
+                self.errors += 1
+
+    def percentile(self, percent):
+        """Return the ``percent`` percentile of recent latencies."""
+        samples = sorted(self.samples)
+        if not samples:
+            return None
+        rank = int(round(percent / 100.0 * (len(samples) - 1)))
+        return samples[rank]
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'wins': self.wins,
+            'degraded': self.degraded,
+            'total_time': self.total_time,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+
+_trail_stats = Timings()
+
+
+def function_label(fn):
+    """
+    Return the label of ``fn`` in :func:`get_stats`: its ``crumb_label``
+    attribute if it has one, otherwise its dotted name, or for instances of
+    callable classes the instance's ``repr`` prefixed with its module if the
+    class defines ``__repr__``. Instrumented functions that would share a
+    label, such as two lambdas in one module, have ``#2``, ``#3`` and so on
+    appended.
+    """
+    label = _labels.get(fn)
+    if label is not None:
+        return label
+    label = getattr(fn, 'crumb_label', None)
+    if label is None:
+        name = getattr(fn, '__qualname__', None)
+        if name is None:
+            name = type(fn).__qualname__
+            if type(fn).__repr__ is not object.__repr__:
+                name = repr(fn)
+        label = '%s.%s' % (getattr(fn, '__module__', None) or '', name)
+    return label
+
+
+def _unique_label(fn):
+    # Caller must hold the lock
+    label = base = function_label(fn)
+    number = 1
+    while label in _function_stats:
+        number += 1
+        label = '%s #%d' % (base, number)
+    _labels[fn] = label
+    return label
+
+
+def _wrap(fn):
+    # Caller must hold the lock
+    timings = _function_stats[_unique_label(fn)] = Timings()
+    if asyncio.iscoroutinefunction(fn) or asyncio.iscoroutinefunction(
+            getattr(fn, '__call__', None)):
+        @functools.wraps(fn)
+        async def wrapper(*args):
+            start = time.perf_counter()
+            try:
+                result = await fn(*args)
+            except BaseException:
+                _record_call(fn, timings, time.perf_counter() - start, True)
+                raise
+            _record_call(fn, timings, time.perf_counter() - start, False)
+            return result
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args):
+            start = time.perf_counter()
+            try:
+                result = fn(*args)
+            except BaseException:
+                _record_call(fn, timings, time.perf_counter() - start, True)
+                raise
+            _record_call(fn, timings, time.perf_counter() - start, False)
+            return result
+    # Keep protocol markers, which may be class attributes of callables
+    wrapper.crumb_batched = getattr(fn, 'crumb_batched', False)
+    wrapper.crumb_context_independent = getattr(
+        fn, 'crumb_context_independent', False)
+    wrapper.crumb_io_bound = getattr(fn, 'crumb_io_bound', False)
+    wrapper.crumb_timings = timings
+    return wrapper
+
+
+def _record_call(fn, timings, duration, error):
+    timings.record(duration, error)
+    signals.crumb_function_called.send(
+        sender=fn, duration=duration, error=error)
+
+
+def instrument(crumb_functions):
+    """Return ``crumb_functions`` wrapped to record their timings."""
+    wrapped = []
+    for fn in crumb_functions:
+        if hasattr(fn, 'crumb_timings'):
+            wrapped.append(fn)
+            continue
+        wrapper = _wrappers.get(fn)
+        if wrapper is None:
+            with _lock:
+                wrapper = _wrappers.get(fn)
+                if wrapper is None:
+                    wrapper = _wrappers[fn] = _wrap(fn)
+        wrapped.append(wrapper)
+    return tuple(wrapped)
+
+
+def record_win(fn):
+    """Record that ``fn``, as returned by :func:`instrument`, named a crumb."""
+    timings = getattr(fn, 'crumb_timings', None)
+    if timings is not None:
+        with _lock:
+            timings.wins += 1
+
+
+def record_degraded(fn=None):
+    """
+    Record that the time budget of a trail ran out waiting for ``fn``, as
+    returned by :func:`instrument`, or for a whole trail if ``fn`` is ``None``.
+    """
+    if fn is None:
+        timings = _trail_stats
+    else:
+        timings = getattr(fn, 'crumb_timings', None)
+    if timings is not None:
+        with _lock:
+            timings.degraded += 1
+
+
+def record_trail(path, duration):
+    _trail_stats.record(duration)
+    signals.trail_built.send(sender=None, path=path, duration=duration)
+
+
+def get_stats():
+    """
+    Return a dict of recorded statistics, with ``'functions'`` mapping the
+    label of each crumb name function, see :func:`function_label`, to its
+    statistics and ``'trails'`` holding statistics for whole trails.
+    """
+    return {
+        'functions': dict((label, timings.as_dict())
+                          for label, timings in _function_stats.items()),
+        'trails': _trail_stats.as_dict(),
+    }
+
+
+def reset():
+    """Discard all recorded statistics."""
+    global _trail_stats
+    _function_stats.clear()
+    _wrappers.clear()
+    _labels.clear()
+    _trail_stats = Timings()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def configure():
+    """Enable or disable instrumentation from Django settings."""
+    if getattr(settings, 'URL_BREADCRUMBS_INSTRUMENTATION', False):
+        enable()
+    else:
+        disable()
+
+
+def setting_changed_receiver(setting, **kwargs):
+    if setting == 'URL_BREADCRUMBS_INSTRUMENTATION':
+        configure()
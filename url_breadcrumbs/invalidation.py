@@ -0,0 +1,168 @@
+"""
+Invalidation of cached breadcrumbs when the model instances that name crumbs
+change.
+
+Register each model field that provides crumb names, along with how to find
+the crumb path an instance names::
+
+    from url_breadcrumbs import invalidation
+
+    invalidation.register(Category, 'title', lambda category: category.url)
+    invalidation.register(Page, 'title', '_cached_url')
+
+When an instance is saved with a changed field or crumb path, or deleted,
+only the trails cached for its crumb path and the paths below it are dropped
+from the trail cache, see
+:func:`~url_breadcrumbs.templatetags.url_breadcrumbs_tags.get_trail_cache`.
+If ``URL_BREADCRUMBS_INDEX`` is set, the instance's entry in the
+:class:`~url_breadcrumbs.index.CrumbIndex` is updated too.
+
+Loading instances only records the field and path values loaded with them.
+Before an instance whose field or path was deferred, or whose path is given
+by a callable, is saved, its saved row is fetched to find its previous name
+and crumb path.
+"""
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete, pre_save)
+
+# Registered (field, path getter) pairs, keyed by model
+_registry = {}
+
+# Stands for a value that was not loaded when an instance was initialized
+_unloaded = object()
+
+
+def _normalize_path(value):
+    if not value:
+        return None
+    return '/' + '/'.join(p for p in str(value).split('/') if p)
+
+
+def _crumb_path(instance, path):
+    return _normalize_path(
+        path(instance) if callable(path) else getattr(instance, path))
+
+
+def _state_attr(field):
+    return '_url_breadcrumbs_%s_state' % field
+
+
+def invalidate_crumb_path(path):
+    """
+    Drop cached trails for the crumb ``path`` and every path under it.
+    Returns the number of cached paths dropped, or ``None`` if they were
+    dropped from a shared cache without counting them, see
+    :meth:`~url_breadcrumbs.cache.TrailCache.invalidate_prefix`.
+    """
+    from url_breadcrumbs.templatetags.url_breadcrumbs_tags import (
+        get_trail_cache)
+    trail_cache = get_trail_cache()
+    if trail_cache is None:
+        return 0
+    return trail_cache.invalidate_prefix(path)
+
+
+def _update_index(path, name):
+    from url_breadcrumbs.index import get_crumb_index
+    crumb_index = get_crumb_index()
+    if crumb_index is None or path is None:
+        return
+    if name is None:
+        if path in crumb_index:
+            crumb_index.delete(path)
+    elif path in crumb_index:
+        crumb_index.insert(path, name)
+
+
+def _on_init(sender, instance, **kwargs):
+    # Only values already loaded are read, so deferred fields are not fetched
+    # and callable paths are not called for every instance loaded
+    values = instance.__dict__
+    for field, path in _registry.get(sender, ()):
+        old_path = _unloaded
+        if not callable(path) and path in values:
+            old_path = _normalize_path(values[path])
+        setattr(instance, _state_attr(field), (
+            values.get(field, _unloaded), old_path))
+
+
+def _on_pre_save(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    old = _unloaded
+    for field, path in _registry.get(sender, ()):
+        if _unloaded not in getattr(instance, _state_attr(field), ()):
+            continue
+        # Fetch the saved row to find what was not loaded with the instance
+        if old is _unloaded:
+            old = sender._base_manager.filter(pk=instance.pk).first()
+        old_state = (None, None)
+        if old is not None:
+            old_state = (getattr(old, field, None), _crumb_path(old, path))
+        setattr(instance, _state_attr(field), old_state)
+
+
+def _on_save(sender, instance, created=False, update_fields=None, **kwargs):
+    for field, path in _registry.get(sender, ()):
+        new_state = (getattr(instance, field, None),
+                     _crumb_path(instance, path))
+        old_state = getattr(instance, _state_attr(field), (None, None))
+        if _unloaded in old_state:
+            old_state = (None, None)
+        setattr(instance, _state_attr(field), new_state)
+        if not created and new_state == old_state:
+            continue
+        new_name, new_path = new_state
+        old_path = old_state[1]
+        if old_path and old_path != new_path:
+            invalidate_crumb_path(old_path)
+            _update_index(old_path, None)
+        if new_path:
+            invalidate_crumb_path(new_path)
+            _update_index(new_path, new_name)
+
+
+def _on_pre_delete(sender, instance, **kwargs):
+    # Crumb paths are found while deferred fields can still be fetched
+    for field, path in _registry.get(sender, ()):
+        setattr(instance, _state_attr(field), (
+            None, _crumb_path(instance, path)))
+
+
+def _on_delete(sender, instance, **kwargs):
+    for field, path in _registry.get(sender, ()):
+        crumb_path = getattr(instance, _state_attr(field), (None, None))[1]
+        if crumb_path and crumb_path is not _unloaded:
+            invalidate_crumb_path(crumb_path)
+            _update_index(crumb_path, None)
+
+
+def register(model, field, path):
+    """
+    Register the ``field`` of ``model`` instances as naming the crumb at a
+    path given by ``path``, either the name of an attribute holding the path
+    or a callable that accepts an instance and returns its path.
+    """
+    entries = _registry.setdefault(model, [])
+    if (field, path) in entries:
+        return
+    entries.append((field, path))
+    uid = 'url_breadcrumbs.invalidation.%s' % model._meta.label
+    post_init.connect(_on_init, sender=model, dispatch_uid=uid)
+    pre_save.connect(_on_pre_save, sender=model, dispatch_uid=uid)
+    post_save.connect(_on_save, sender=model, dispatch_uid=uid)
+    pre_delete.connect(_on_pre_delete, sender=model, dispatch_uid=uid)
+    post_delete.connect(_on_delete, sender=model, dispatch_uid=uid)
+
+
+def unregister(model, field=None):
+    """Stop invalidating crumbs for ``field``, or all fields, of ``model``."""
+    entries = [entry for entry in _registry.get(model, ())
+               if field is not None and entry[0] != field]
+    if entries:
+        _registry[model] = entries
+        return
+    _registry.pop(model, None)
+    uid = 'url_breadcrumbs.invalidation.%s' % model._meta.label
+    for signal in (post_init, pre_save, post_save, pre_delete, post_delete):
+        signal.disconnect(sender=model, dispatch_uid=uid)
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from url_breadcrumbs.table import write_table
+
+
+def read_entries(filename):
+    """
+    Yield ``(path, name)`` entries from a JSON file holding an object that
+    maps paths to names, or from a text file of tab-separated path and name
+    lines.
+    """
+    with open(filename, encoding='utf-8') as f:
+        if filename.endswith('.json'):
+            for path, name in json.load(f).items():
+                yield path, name
+            return
+        for line_number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            try:
+                path, name = line.split('\t', 1)
+            except ValueError:
+                raise CommandError(
+                    "%s:%d: expected a tab-separated path and name"
+                    % (filename, line_number))
+            yield path, name
+
+
+class Command(BaseCommand):
+    help = ("Compile crumb names for paths into a table file for"
+            " url_breadcrumbs.table.CrumbTable")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source', help="JSON object of paths to names, or a file of"
+            " tab-separated path and name lines")
+        parser.add_argument('table', help="table file to write")
+
+    def handle(self, *args, **options):
+        count = write_table(read_entries(options['source']), options['table'])
+        self.stdout.write("Wrote %d crumb names to %s"
+                          % (count, options['table']))
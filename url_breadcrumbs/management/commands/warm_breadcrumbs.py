@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from url_breadcrumbs.warmup import read_paths, shared_caches, warm
+
+
+class Command(BaseCommand):
+    help = ("Pre-build breadcrumb trails for the paths in a URL list, sitemap"
+            " or access log to warm the configured breadcrumb caches")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source', help="file of URLs, sitemap XML or access log, or - to"
+            " read standard input")
+        parser.add_argument(
+            '--format', default='auto',
+            choices=('auto', 'urls', 'sitemap', 'log'))
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help="number of threads or processes building trails")
+        parser.add_argument(
+            '--processes', action='store_true',
+            help="use a process pool rather than a thread pool")
+        parser.add_argument(
+            '--limit', type=int, help="warm at most this many paths")
+
+    def handle(self, *args, **options):
+        if not shared_caches():
+            raise CommandError(
+                "No shared breadcrumb cache to warm, caches held in process"
+                " memory are discarded when this command exits. Set"
+                " URL_BREADCRUMBS_TRAIL_CACHE or URL_BREADCRUMBS_HTML_CACHE"
+                " to the alias of a cache shared between processes.")
+        if options['source'] == '-':
+            paths = list(read_paths(sys.stdin, options['format']))
+        else:
+            with open(options['source'], encoding='utf-8') as f:
+                paths = list(read_paths(f, options['format']))
+        if options['limit'] is not None:
+            paths = paths[:options['limit']]
+        stats = warm(paths, workers=options['workers'],
+                     processes=options['processes'])
+        rate = stats['paths'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(
+            "Warmed %(paths)d paths (%(trails)d trails cached, %(errors)d"
+            " errors)" % stats +
+            " in %.2fs, %.0f paths/s" % (stats['seconds'], rate))
@@ -0,0 +1,132 @@
+"""
+Middleware sharing one breadcrumb trail between everything that renders or
+inspects breadcrumbs during a request.
+
+Add ``'url_breadcrumbs.middleware.BreadcrumbsMiddleware'`` to the
+``MIDDLEWARE`` setting to set ``request.breadcrumbs`` on every request. The
+trail is only built when first used, for example by the ``url_breadcrumbs``
+template tag, and is then reused by every later use in the same request.
+
+Without the middleware, breadcrumb template tags still share one trail within
+each template render.
+"""
+from url_breadcrumbs import i18n
+from url_breadcrumbs.crumb_fns import is_context_independent
+from url_breadcrumbs.pipeline import get_pipeline
+
+
+class LazyBreadcrumbs(object):
+    """
+    The breadcrumb trail of a request, built on first access.
+
+    Iterating, indexing or taking the length gives the
+    ``(crumb_path, path_fragment, crumb_name)`` crumbs of the trail with the
+    default Home crumb name.
+
+    The trail is rebuilt if ``request.crumb`` or ``request.crumbs`` are set or
+    changed after it was built, or if the active language changes. Crumb name
+    functions are called with the template context of the first access, so
+    functions that depend on the context should see the same values in every
+    template using the trail. A trail first built without a template context,
+    for example for an ETag, is rebuilt when a template first uses it unless
+    every crumb name function is marked
+    :func:`~url_breadcrumbs.crumb_fns.context_independent`.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self._crumbs = {}
+        # Home crumb names of trails built without a template context
+        self._contextless = set()
+        self._overrides = None
+        self.builds = 0
+
+    def _get_overrides(self):
+        request = self.request
+        crumbs = getattr(request, 'crumbs', None)
+        return (
+            i18n.get_language(),
+            hasattr(request, 'crumb'),
+            getattr(request, 'crumb', None),
+            dict(crumbs) if crumbs is not None else None,
+        )
+
+    def get_crumbs(self, context=None, crumb_home_name='Home'):
+        """Return the list of crumbs, building them if necessary."""
+        from url_breadcrumbs.templatetags.url_breadcrumbs_tags import (
+            get_crumbs)
+        overrides = self._get_overrides()
+        if overrides != self._overrides:
+            self._crumbs.clear()
+            self._contextless.clear()
+            self._overrides = overrides
+        crumbs = self._crumbs.get(crumb_home_name)
+        if (crumbs is not None and context is not None
+                and crumb_home_name in self._contextless):
+            self._contextless.discard(crumb_home_name)
+            if not all(is_context_independent(fn) for fn in get_pipeline()):
+                crumbs = None
+        if crumbs is None:
+            if context is None:
+                self._contextless.add(crumb_home_name)
+                context = {'request': self.request}
+            crumbs = get_crumbs(context, self.request, crumb_home_name)
+            self._crumbs[crumb_home_name] = crumbs
+            self.builds += 1
+        return crumbs
+
+    @property
+    def crumbs(self):
+        return self.get_crumbs()
+
+    def fingerprint(self, crumb_delim='&raquo;', crumb_home_name='Home',
+                    context=None):
+        """
+        Return the :func:`~url_breadcrumbs.trails.trail_fingerprint` of the
+        trail, building it with the template ``context`` if necessary.
+        """
+        from url_breadcrumbs.trails import trail_fingerprint
+        return trail_fingerprint(
+            self.get_crumbs(context, crumb_home_name), crumb_delim)
+
+    def __iter__(self):
+        return iter(self.crumbs)
+
+    def __len__(self):
+        return len(self.crumbs)
+
+    def __getitem__(self, index):
+        return self.crumbs[index]
+
+
+def get_breadcrumbs(request, context=None):
+    """
+    Return the :class:`LazyBreadcrumbs` shared by uses of the breadcrumbs of
+    ``request``: ``request.breadcrumbs`` if the middleware set it, otherwise
+    one shared within the template render of ``context``, if any.
+    """
+    breadcrumbs = getattr(request, 'breadcrumbs', None)
+    if isinstance(breadcrumbs, LazyBreadcrumbs):
+        return breadcrumbs
+    render_context = getattr(context, 'render_context', None)
+    if render_context is None:
+        return LazyBreadcrumbs(request)
+    key = ('url_breadcrumbs', id(request))
+    breadcrumbs = render_context.get(key)
+    if breadcrumbs is None or breadcrumbs.request is not request:
+        breadcrumbs = render_context[key] = LazyBreadcrumbs(request)
+    return breadcrumbs
+
+
+class BreadcrumbsMiddleware(object):
+    """Set a :class:`LazyBreadcrumbs` as ``request.breadcrumbs``."""
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        self.process_request(request)
+        return self.get_response(request)
+
+    def process_request(self, request):
+        request.breadcrumbs = LazyBreadcrumbs(request)
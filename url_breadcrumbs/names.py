@@ -0,0 +1,113 @@
+"""
+Generation of fallback crumb names from URL path fragments.
+"""
+import re
+
+from django.conf import settings
+
+from url_breadcrumbs import i18n
+from url_breadcrumbs.cache import LRUCache
+# The humanizer itself doesn't depend on Django
+from url_breadcrumbs.core import (  # noqa
+    DEFAULT_SEPARATORS, Humanizer, re_identifier, re_title_apostrophe,
+    re_title_digit)
+
+# Kept for backwards compatibility, the Humanizer replaces it
+re_spacify = re.compile(r'[-_+]')
+
+# Process-wide cache of fallback crumb names generated from path fragments,
+# sized by the ``URL_BREADCRUMBS_NAME_CACHE_SIZE`` setting
+DEFAULT_NAME_CACHE_SIZE = 1024
+name_cache = LRUCache(DEFAULT_NAME_CACHE_SIZE)
+# Caches of translated names, keyed by language code, used instead of
+# name_cache when translation is enabled
+language_name_caches = {}
+
+_humanizer = None
+
+
+def get_humanizer():
+    """
+    Return the :class:`Humanizer` configured by the
+    ``URL_BREADCRUMBS_SLUG_SEPARATORS``, ``URL_BREADCRUMBS_ACRONYMS``,
+    ``URL_BREADCRUMBS_NAME_OVERRIDES`` and ``URL_BREADCRUMBS_STOP_WORDS``
+    settings.
+    """
+    global _humanizer
+    if _humanizer is None:
+        _humanizer = Humanizer(
+            separators=getattr(settings, 'URL_BREADCRUMBS_SLUG_SEPARATORS',
+                               DEFAULT_SEPARATORS),
+            acronyms=getattr(settings, 'URL_BREADCRUMBS_ACRONYMS', None),
+            overrides=getattr(settings, 'URL_BREADCRUMBS_NAME_OVERRIDES',
+                              None),
+            stop_words=getattr(settings, 'URL_BREADCRUMBS_STOP_WORDS', None),
+        )
+    return _humanizer
+
+
+def get_name_cache(language=None):
+    """
+    Return the cache of fallback crumb names for ``language``, or the cache
+    of untranslated names if ``language`` is ``None``.
+    """
+    if language is None:
+        return name_cache
+    cache = language_name_caches.get(language)
+    if cache is None:
+        cache = language_name_caches.setdefault(
+            language, LRUCache(name_cache.maxsize))
+    return cache
+
+
+def slug_to_name(path_fragment):
+    """
+    Convert a URL path fragment into a title-cased crumb name, e.g.
+    ``'of_url'`` becomes ``'Of Url'``, with the humanizer returned by
+    :func:`get_humanizer`. If translation is enabled, see
+    :mod:`url_breadcrumbs.i18n`, the name is then translated into the active
+    language.
+
+    Results are kept in the bounded :data:`name_cache` LRU cache, or in a
+    cache of the same size for each language if translation is enabled. Set
+    ``URL_BREADCRUMBS_NAME_CACHE_SIZE`` in Django settings to change the
+    number of names cached, or to ``0`` to disable caching.
+    """
+    language = i18n.get_language()
+    cache = name_cache if language is None else get_name_cache(language)
+    crumb_name = cache.get(path_fragment)
+    if crumb_name is None:
+        crumb_name = (_humanizer or get_humanizer())(path_fragment)
+        if language is not None:
+            crumb_name = i18n.gettext(crumb_name)
+        cache.set(path_fragment, crumb_name)
+    return crumb_name
+
+
+HUMANIZER_SETTINGS = (
+    'URL_BREADCRUMBS_SLUG_SEPARATORS',
+    'URL_BREADCRUMBS_ACRONYMS',
+    'URL_BREADCRUMBS_NAME_OVERRIDES',
+    'URL_BREADCRUMBS_STOP_WORDS',
+)
+
+
+def configure():
+    """Size the name caches from Django settings."""
+    maxsize = getattr(settings, 'URL_BREADCRUMBS_NAME_CACHE_SIZE',
+                      DEFAULT_NAME_CACHE_SIZE)
+    name_cache.maxsize = maxsize
+    for cache in list(language_name_caches.values()):
+        cache.maxsize = maxsize
+
+
+def setting_changed_receiver(setting, **kwargs):
+    global _humanizer
+    if setting == 'URL_BREADCRUMBS_NAME_CACHE_SIZE':
+        configure()
+    elif setting in HUMANIZER_SETTINGS:
+        _humanizer = None
+        name_cache.clear()
+        language_name_caches.clear()
+    elif setting in ('URL_BREADCRUMBS_I18N', 'LANGUAGES'):
+        language_name_caches.clear()
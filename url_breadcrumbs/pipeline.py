@@ -0,0 +1,75 @@
+"""
+Resolution of the ``URL_BREADCRUMBS_FUNCTIONS`` setting into the tuple of
+crumb name functions called by the
+:mod:`url_breadcrumbs.templatetags.url_breadcrumbs_tags` template tag.
+
+The setting is validated and resolved once, when the app is loaded, and again
+whenever the setting is changed, for example by
+:func:`django.test.utils.override_settings`.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+SETTING_NAME = 'URL_BREADCRUMBS_FUNCTIONS'
+
+_missing = object()
+# The setting value the current pipeline was built from, and the pipeline
+_source = _missing
+_pipeline = ()
+
+
+def build_pipeline(fns):
+    """
+    Return a tuple of crumb name functions for the ``fns`` setting value,
+    which may be ``None`` or a list of callables or dotted paths to callables.
+
+    Raises :class:`~django.core.exceptions.ImproperlyConfigured` if the value
+    is not valid.
+    """
+    if fns is None:
+        return ()
+    if isinstance(fns, str) or not hasattr(fns, '__iter__'):
+        raise ImproperlyConfigured(
+            "%s in settings is invalid, it cannot be iterated over. Should be"
+            " a list of callables: %r" % (SETTING_NAME, fns))
+    pipeline = []
+    for fn in fns:
+        if isinstance(fn, str):
+            try:
+                fn = import_string(fn)
+            except ImportError as ex:
+                raise ImproperlyConfigured(
+                    "%s in settings includes %r which cannot be imported: %s"
+                    % (SETTING_NAME, fn, ex))
+        if not callable(fn):
+            raise ImproperlyConfigured(
+                "%s in settings includes %r which is not callable"
+                % (SETTING_NAME, fn))
+        pipeline.append(fn)
+    return tuple(pipeline)
+
+
+def load_pipeline():
+    """Build the pipeline from the current settings."""
+    global _source, _pipeline
+    source = getattr(settings, SETTING_NAME, None)
+    _pipeline = build_pipeline(source)
+    _source = source
+    return _pipeline
+
+
+def get_pipeline():
+    """
+    Return the tuple of crumb name functions, rebuilding it if the setting
+    was reassigned since the pipeline was built.
+    """
+    if getattr(settings, SETTING_NAME, None) is not _source:
+        return load_pipeline()
+    return _pipeline
+
+
+def setting_changed_receiver(setting, **kwargs):
+    """Rebuild the pipeline when ``URL_BREADCRUMBS_FUNCTIONS`` changes."""
+    if setting == SETTING_NAME:
+        load_pipeline()
@@ -0,0 +1,20 @@
+from django.dispatch import Signal
+
+# Sent after each crumb name function call when instrumentation is enabled,
+# with the function as sender and arguments:
+#  - duration (float): seconds taken by the call
+#  - error (bool): True if the function raised an exception
+crumb_function_called = Signal()
+
+# Sent after each breadcrumb trail is built when instrumentation is enabled,
+# with arguments:
+#  - path (str): URL path of the trail
+#  - duration (float): seconds taken to build the trail
+trail_built = Signal()
+
+# Sent when the time budget for building a breadcrumb trail runs out and
+# some crumbs fall back to names derived from their path fragments, with
+# arguments:
+#  - path (str): URL path of the trail
+#  - crumb_paths (list): paths of the crumbs that fell back
+trail_degraded = Signal()
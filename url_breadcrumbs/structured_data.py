@@ -0,0 +1,60 @@
+"""
+Structured data output of breadcrumb trails, as schema.org ``BreadcrumbList``
+JSON-LD or plain JSON.
+
+JSON is written directly from the crumbs rather than through
+:func:`json.dumps`, and strings are escaped so the output can be embedded in
+an HTML ``<script>`` element.
+"""
+from json.encoder import encode_basestring_ascii
+
+from django.utils.safestring import mark_safe
+
+# Escape characters significant to HTML, as django.utils.html.json_script does
+_html_escapes = {
+    ord('<'): '\\u003C',
+    ord('>'): '\\u003E',
+    ord('&'): '\\u0026',
+}
+
+
+def _json_string(value):
+    return encode_basestring_ascii(str(value)).translate(_html_escapes)
+
+
+def _absolute_url(request, path, base_url):
+    if base_url is not None:
+        return base_url + path
+    return request.build_absolute_uri(path)
+
+
+def to_jsonld(crumbs, request=None, base_url=None):
+    """
+    Return a schema.org ``BreadcrumbList`` JSON-LD document for ``crumbs``.
+
+    Crumb URLs are made absolute with ``request.build_absolute_uri()``, or by
+    prefixing ``base_url`` such as ``'https://example.com'`` if given.
+    """
+    items = []
+    for position, (path, path_fragment, name) in enumerate(crumbs, 1):
+        items.append(
+            '{"@type":"ListItem","position":%d,"name":%s,"item":%s}'
+            % (position, _json_string(name),
+               _json_string(_absolute_url(request, path, base_url))))
+    return mark_safe(
+        '{"@context":"https://schema.org","@type":"BreadcrumbList",'
+        '"itemListElement":[%s]}' % ','.join(items))
+
+
+def to_json(crumbs, request=None, base_url=None):
+    """
+    Return a JSON list of ``{"name", "path", "url"}`` objects for ``crumbs``,
+    with absolute URLs as for :func:`to_jsonld`.
+    """
+    items = []
+    for path, path_fragment, name in crumbs:
+        items.append(
+            '{"name":%s,"path":%s,"url":%s}'
+            % (_json_string(name), _json_string(path),
+               _json_string(_absolute_url(request, path, base_url))))
+    return mark_safe('[%s]' % ','.join(items))
@@ -0,0 +1,157 @@
+"""
+A compact, sorted on-disk table of crumb names read through :mod:`mmap`.
+
+For sites with crumb names for millions of paths that are known ahead of
+time, compile the names into a table file with the ``build_crumb_table``
+management command::
+
+    python manage.py build_crumb_table crumbs.tsv crumbs.table
+
+then name crumbs from the table with a :class:`CrumbTable` in the
+``URL_BREADCRUMBS_FUNCTIONS`` setting::
+
+    URL_BREADCRUMBS_FUNCTIONS = [CrumbTable('/srv/site/crumbs.table')]
+
+The table is memory-mapped read-only, so all worker processes on a server
+share the same pages of it rather than each loading the names into a dict.
+Names are found by binary search over the sorted paths.
+
+File layout, with all integers little-endian:
+
+ - header: the magic bytes ``UBCT``, format version and entry count
+ - index: the offset of each record in path order, as 64-bit integers
+ - records: path length and name length as 32-bit integers, followed by the
+   UTF-8 encoded path and name
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+MAGIC = b'UBCT'
+VERSION = 1
+_header = struct.Struct('<4sII')
+_offset = struct.Struct('<Q')
+_record = struct.Struct('<II')
+
+
+def normalize_path(path):
+    return '/' + '/'.join(p for p in path.split('/') if p)
+
+
+def write_table(entries, filename):
+    """
+    Write a table of ``(path, name)`` ``entries`` to ``filename``. Paths are
+    normalized to the ``/a/b`` form of crumb paths and later duplicates win.
+
+    The file is written to a temporary file then renamed into place, so
+    processes with the previous table mapped keep a consistent view of it.
+    Returns the number of entries written.
+    """
+    table = {}
+    for path, name in entries:
+        table[normalize_path(path).encode('utf-8')] = name.encode('utf-8')
+    keys = sorted(table)
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_header.pack(MAGIC, VERSION, len(keys)))
+            offset = _header.size + _offset.size * len(keys)
+            for key in keys:
+                f.write(_offset.pack(offset))
+                offset += _record.size + len(key) + len(table[key])
+            for key in keys:
+                name = table[key]
+                f.write(_record.pack(len(key), len(name)))
+                f.write(key)
+                f.write(name)
+        os.chmod(tmp_filename, 0o644)
+        os.rename(tmp_filename, filename)
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
+    return len(keys)
+
+
+class CrumbTable(object):
+    """
+    Batched crumb name function naming crumbs from a table file written by
+    :func:`write_table`. The file is opened and mapped on first use, and
+    mapped again if it is replaced.
+    """
+    crumb_batched = True
+    crumb_context_independent = True
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        # The mapped table and its entry count
+        self._table = (None, 0)
+        self._stat = None
+
+    def _open(self):
+        stat = os.stat(self.filename)
+        stat_key = (stat.st_ino, stat.st_mtime, stat.st_size)
+        if stat_key == self._stat:
+            return self._table
+        with self._lock:
+            if stat_key != self._stat:
+                with open(self.filename, 'rb') as f:
+                    table_map = mmap.mmap(
+                        f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, version, count = _header.unpack_from(table_map, 0)
+                if magic != MAGIC or version != VERSION:
+                    table_map.close()
+                    raise ValueError(
+                        "%s is not a crumb table" % self.filename)
+                # Earlier maps are left for the garbage collector, as other
+                # threads may still be reading them
+                self._table = (table_map, count)
+                self._stat = stat_key
+        return self._table
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.filename)
+
+    def __len__(self):
+        return self._open()[1]
+
+    def _path_at(self, table_map, i):
+        offset = _offset.unpack_from(
+            table_map, _header.size + i * _offset.size)[0]
+        path_len, name_len = _record.unpack_from(table_map, offset)
+        start = offset + _record.size
+        return start, path_len, name_len
+
+    def _lookup(self, table_map, count, path):
+        key = normalize_path(path).encode('utf-8')
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, path_len, name_len = self._path_at(table_map, mid)
+            mid_key = table_map[start:start + path_len]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                start += path_len
+                return table_map[start:start + name_len].decode('utf-8')
+        return None
+
+    def lookup(self, path):
+        """Return the name for the crumb ``path``, or ``None``."""
+        table_map, count = self._open()
+        return self._lookup(table_map, count, path)
+
+    def __call__(self, context, request, items):
+        # Check for a replaced table once per trail, not per crumb
+        table_map, count = self._open()
+        names = {}
+        for crumb_path, path_fragment, is_current_page in items:
+            name = self._lookup(table_map, count, crumb_path)
+            if name is not None:
+                names[crumb_path] = name
+        return names
@@ -1,17 +1,215 @@
-import re
-import logging
+import hashlib
 
 from django import template
 from django.conf import settings
-from django.template.defaultfilters import title
+from django.utils.safestring import mark_safe
+
+from url_breadcrumbs import i18n
+from url_breadcrumbs.cache import HtmlCache, TrailCache
+from url_breadcrumbs.crumb_fns import is_context_independent
+from url_breadcrumbs.html import render_html
+from url_breadcrumbs.middleware import get_breadcrumbs
+# Name conversion helpers, importable from here as they always have been
+from url_breadcrumbs.names import (  # noqa
+    name_cache, re_spacify, slug_to_name)
+from url_breadcrumbs.pipeline import get_pipeline
+from url_breadcrumbs.structured_data import to_json, to_jsonld
+from url_breadcrumbs.trails import build_crumbs
 
 register = template.Library()
 
-re_spacify = re.compile(r'[-_+]')
-log = logging.getLogger(__name__)
+TEMPLATE_NAME = 'url_breadcrumbs.html'
+
+# Caches and options built from settings, keyed by name. They are built when
+# first used and dropped by setting_changed_receiver when settings change
+_configured = {}
+
+
+def _load_trail_cache():
+    backend = getattr(settings, 'URL_BREADCRUMBS_TRAIL_CACHE', None)
+    if not backend:
+        return None
+    return TrailCache(
+        backend,
+        timeout=getattr(settings, 'URL_BREADCRUMBS_TRAIL_CACHE_TIMEOUT', None),
+        timeouts=getattr(settings, 'URL_BREADCRUMBS_TRAIL_CACHE_TIMEOUTS', {}),
+        maxsize=getattr(settings, 'URL_BREADCRUMBS_TRAIL_CACHE_SIZE', 1024))
+
+
+def _load_html_cache():
+    backend = getattr(settings, 'URL_BREADCRUMBS_HTML_CACHE', None)
+    if not backend:
+        return None
+    return HtmlCache(
+        backend,
+        timeout=getattr(settings, 'URL_BREADCRUMBS_HTML_CACHE_TIMEOUT', None),
+        version=getattr(settings, 'URL_BREADCRUMBS_HTML_CACHE_VERSION', None),
+        maxsize=getattr(settings, 'URL_BREADCRUMBS_HTML_CACHE_SIZE', 1024))
+
+
+def _load_renderer():
+    return getattr(settings, 'URL_BREADCRUMBS_RENDERER', 'template')
+
+
+def _get_configured(name, load):
+    try:
+        return _configured[name]
+    except KeyError:
+        return _configured.setdefault(name, load())
+
+
+def setting_changed_receiver(setting, **kwargs):
+    """Rebuild caches and options when their settings change."""
+    if setting == 'CACHES':
+        _configured.pop('trail', None)
+        _configured.pop('html', None)
+    elif setting.startswith('URL_BREADCRUMBS_TRAIL_CACHE'):
+        _configured.pop('trail', None)
+    elif setting.startswith('URL_BREADCRUMBS_HTML_CACHE'):
+        _configured.pop('html', None)
+    elif setting == 'URL_BREADCRUMBS_RENDERER':
+        _configured.pop('renderer', None)
+
+
+def get_trail_cache():
+    """
+    Return the :class:`~url_breadcrumbs.cache.TrailCache` configured in Django
+    settings, or ``None`` if whole-trail caching is disabled.
+
+    Trail caching is opt-in, set ``URL_BREADCRUMBS_TRAIL_CACHE`` to
+    ``'memory'`` to cache trails in process memory or to the alias of a cache
+    in Django's ``CACHES`` setting. Optional related settings are:
+
+     - ``URL_BREADCRUMBS_TRAIL_CACHE_TIMEOUT`` : default lifetime of cached
+       trails in seconds. Defaults to ``None``, i.e. no expiry.
+     - ``URL_BREADCRUMBS_TRAIL_CACHE_TIMEOUTS`` : dictionary mapping path
+       prefixes to the lifetime of trails under that prefix.
+     - ``URL_BREADCRUMBS_TRAIL_CACHE_SIZE`` : maximum number of paths cached
+       in process memory. Defaults to 1024.
+
+    The cache is built when first used and rebuilt when these settings
+    change.
+    """
+    return _get_configured('trail', _load_trail_cache)
+
+
+def get_html_cache():
+    """
+    Return the :class:`~url_breadcrumbs.cache.HtmlCache` configured in Django
+    settings, or ``None`` if caching of rendered breadcrumb HTML is disabled.
+
+    HTML caching is opt-in, set ``URL_BREADCRUMBS_HTML_CACHE`` to
+    ``'memory'`` to cache HTML in process memory or to the alias of a cache
+    in Django's ``CACHES`` setting. Optional related settings are:
+
+     - ``URL_BREADCRUMBS_HTML_CACHE_TIMEOUT`` : lifetime of cached HTML in
+       seconds. Defaults to ``None``, i.e. no expiry.
+     - ``URL_BREADCRUMBS_HTML_CACHE_VERSION`` : extra key version, change
+       this on deploy to discard HTML cached by earlier releases.
+     - ``URL_BREADCRUMBS_HTML_CACHE_SIZE`` : maximum number of entries cached
+       in process memory. Defaults to 1024.
+
+    The cache is built when first used and rebuilt when these settings
+    change.
+    """
+    return _get_configured('html', _load_html_cache)
+
+
+def invalidate_trail(path=None):
+    """
+    Remove the cached breadcrumb trails for ``path``, or all cached trails if
+    no path is given.
+    """
+    trail_cache = get_trail_cache()
+    if trail_cache is None:
+        return
+    if path is None:
+        trail_cache.clear()
+    else:
+        trail_cache.invalidate(path)
+
+
+def _is_trail_cacheable(request):
+    """
+    A trail can be cached by path if the request does not override crumb
+    names and every crumb name function is marked as context independent.
+    """
+    if hasattr(request, 'crumb') or hasattr(request, 'crumbs'):
+        return False
+    return all(is_context_independent(fn) for fn in get_pipeline())
+
+
+def _template_digest(tmpl):
+    # Digest of the template source, memoized on the template object
+    digest = getattr(tmpl, '_url_breadcrumbs_digest', None)
+    if digest is None:
+        source = getattr(tmpl, 'source', '')
+        digest = hashlib.md5(
+            source.encode('utf-8'), usedforsecurity=False).hexdigest()
+        tmpl._url_breadcrumbs_digest = digest
+    return digest
+
+
+def render_crumbs(context, crumb_context, template_name=TEMPLATE_NAME,
+                  renderer=None):
+    """
+    Render the ``crumb_context`` dictionary returned by
+    :func:`url_breadcrumbs` with the template ``template_name``, as the
+    ``url_breadcrumbs`` template tag does within ``context``.
+
+    If ``renderer`` is ``'python'`` the HTML is instead built directly by
+    :func:`url_breadcrumbs.html.render_html`, which produces the same markup
+    as the default template much faster but ignores any customized template.
+    ``renderer`` defaults to the ``URL_BREADCRUMBS_RENDERER`` setting, or
+    ``'template'`` if that is not set.
+
+    If :func:`get_html_cache` returns a cache, HTML rendered by the template
+    is cached and reused for identical crumbs, delimiter and template.
+    """
+    if renderer is None:
+        renderer = _get_configured('renderer', _load_renderer)
+    if renderer == 'python':
+        return render_html(crumb_context['crumbs'],
+                           crumb_context['crumb_delim'], context.autoescape)
+    elif renderer != 'template':
+        raise template.TemplateSyntaxError(
+            "Unknown breadcrumbs renderer %r, should be 'template' or"
+            " 'python'" % renderer)
+    if context.template is not None:
+        tmpl = context.template.engine.get_template(template_name)
+    else:
+        tmpl = template.Engine.get_default().get_template(
+            template_name)
+    html_cache = get_html_cache()
+    key = None
+    if html_cache is not None:
+        # Custom templates may translate text of their own
+        key = html_cache.make_key(
+            template_name, _template_digest(tmpl), crumb_context['crumbs'],
+            crumb_context['crumb_delim'], context.autoescape,
+            i18n.get_language())
+        html = html_cache.get(key)
+        if html is not None:
+            return mark_safe(html)
+    html = tmpl.render(context.new(crumb_context))
+    if key is not None:
+        html_cache.set(key, html)
+    return html
+
+
+@register.simple_tag(takes_context=True, name='url_breadcrumbs')
+def url_breadcrumbs_tag(context, request, renderer=None):
+    """
+    Template tag rendering the breadcrumb trail for ``request``, see
+    :func:`url_breadcrumbs` and :func:`render_crumbs`. The renderer can be
+    chosen per call::
+
+        {% url_breadcrumbs request renderer='python' %}
+    """
+    return render_crumbs(context, url_breadcrumbs(context, request),
+                         renderer=renderer)
 
 
-@register.inclusion_tag('url_breadcrumbs.html', takes_context=True)
 def url_breadcrumbs(context, request):
     """
     Determine a breadcrumb trail based on the URL path of the current request.
@@ -37,7 +235,9 @@ def url_breadcrumbs(context, request):
 
     If ``URL_BREADCRUMBS_FUNCTIONS`` in Django :mod:`django.conf.settings`
     is available, each callable item in this list will be invoked to see if
-    it returns a crumb name. The callables must accept four arguments:
+    it returns a crumb name. Items may also be dotted paths to callables,
+    these are imported when the app is loaded. The callables must accept
+    four arguments:
 
      - ``context`` (:class:`django.template.Context`): Django request context
      - ``request`` (:class:`django.http.HttpRequest`): Django request
@@ -45,68 +245,103 @@ def url_breadcrumbs(context, request):
      - ``is_current_page`` (bool): True if path fragment is for current
        page, i.e. the last page in the breadcrumbs list.
 
+    Callables marked with :func:`url_breadcrumbs.crumb_fns.batched` are
+    instead invoked once with all the path fragments that need names, see
+    :mod:`url_breadcrumbs.crumb_fns`.
+
     Note that these functions are not invoked if ``request.crumb`` or
     ``request.crumbs`` is set.
 
+    If ``URL_BREADCRUMBS_INDEX`` is set, names of whole path prefixes found in
+    the :class:`~url_breadcrumbs.index.CrumbIndex` take priority over the
+    functions, but not over ``request.crumb`` or ``request.crumbs``.
+
     Optional :class:`template context <django.template.Context>` attributes:
      - ``crumb_home_name`` : override the name of the root Home crumb that is
-       always present. Defaults to 'Home'.
+       always present. Defaults to 'Home', translated into the active
+       language if ``URL_BREADCRUMBS_I18N`` is set, see
+       :mod:`url_breadcrumbs.i18n`.
      - ``crumb_delim`` : override the delimiter character rendered between
        crumb path components by the default template. Defaults to ``&raquo;``.
        Note that this value is assumed to be safe by the default template.
+
+    The trail is shared with other breadcrumb tags in the same template render
+    or, if :class:`~url_breadcrumbs.middleware.BreadcrumbsMiddleware` is
+    enabled, with all uses in the same request.
+
+    Whole trails are cached by request path if ``URL_BREADCRUMBS_TRAIL_CACHE``
+    is set and the trail cannot vary by context, see :func:`get_trail_cache`.
+
+    Returns the dictionary of ``crumbs`` and ``crumb_delim`` used to render the
+    ``url_breadcrumbs.html`` template.
     """
     # Load optional context items
     crumb_home_name = context.get('crumb_home_name', 'Home')
     crumb_delim = context.get('crumb_delim', '&raquo;')
 
-    # Split current URL path into component path items
-    slug_items = [p for p in request.path.split('/') if p]
-    # Always include root/Home path
-    crumbs = [('/', '/', crumb_home_name)]
-    for i, path_fragment in enumerate(slug_items, 1):
-        is_current_page = i == len(slug_items)
-        crumb_path = '/%s' % '/'.join(slug_items[:i])
-        crumb_name = None
-        # request.crumb attr string overrides name of current page's crumb
-        if is_current_page and hasattr(request, 'crumb'):
-            crumb_name = request.crumb
-        # request.crumbs attr dict overrides names of arbitrary crumbs
-        elif hasattr(request, 'crumbs') and path_fragment in request.crumbs:
-            crumb_name = request.crumbs.get(path_fragment)
-        else:
-            # No explicit crumb name provided yet.
-
-            # Check whether any callables in URL_BREADCRUMBS_FUNCTIONS give
-            # us a crumb name
-            try:
-                for fn in settings.URL_BREADCRUMBS_FUNCTIONS:
-                    crumb_name = None
-                    try:
-                        crumb_name = fn(context, request,
-                                        path_fragment, is_current_page)
-                    except:
-                        # Error in crumb name generation function
-                        log.warn("Crumb generation function %s failed"
-                                 % fn, exc_info=True)
-                    if crumb_name is not None:
-                        break  # Pay attention to any non-None return value
-            except AttributeError:
-                # URL_BREADCRUMBS_FUNCTIONS not in settings, ignore
-                pass
-            except TypeError:
-                # URL_BREADCRUMBS_FUNCTIONS in settings but not iterable
-                log.warn("URL_BREADCRUMBS_FUNCTIONS in settings is invalid,"
-                         " it cannot be iterated over. Should be a list of"
-                         " callables: %s" % settings.URL_BREADCRUMBS_FUNCTIONS,
-                         exc_info=True)
-
-            # Fallback strategy is to reformat the slug component to title
-            # case and hope this produces a human-friendly crumb name...
-            if crumb_name is None:
-                crumb_name = re_spacify.sub(' ', path_fragment)
-                crumb_name = title(crumb_name)
-        # If no crumb name, skip crumb entry
-        if not crumb_name:
-            continue
-        crumbs.append((crumb_path, path_fragment, crumb_name))
+    # Share one trail with other uses in the request or template render
+    crumbs = get_breadcrumbs(request, context).get_crumbs(
+        context, crumb_home_name)
     return {'crumbs': crumbs, 'crumb_delim': crumb_delim}
+
+
+def get_crumbs(context, request, crumb_home_name='Home'):
+    """
+    Return the list of crumbs for ``request``, from the trail cache if
+    possible, see :func:`get_trail_cache`.
+    """
+    trail_cache = get_trail_cache()
+    if trail_cache is not None and _is_trail_cacheable(request):
+        language = i18n.get_language()
+        crumbs = trail_cache.get(request.path, crumb_home_name, language)
+        if crumbs is None:
+            crumbs = build_crumbs(context, request, crumb_home_name)
+            # Don't keep fallback names from a trail that ran out of time
+            if not crumbs.degraded:
+                trail_cache.set(
+                    request.path, crumb_home_name, crumbs, language)
+        return crumbs
+    return build_crumbs(context, request, crumb_home_name)
+
+
+def _render_structured_data(context, request, kind, serialize):
+    crumbs = url_breadcrumbs(context, request)['crumbs']
+    html_cache = get_html_cache()
+    key = None
+    if html_cache is not None:
+        # Output varies by host and scheme through the absolute URLs
+        key = html_cache.make_key(
+            kind, request.build_absolute_uri('/'), crumbs, '')
+        output = html_cache.get(key)
+        if output is not None:
+            return mark_safe(output)
+    output = serialize(crumbs, request)
+    if key is not None:
+        html_cache.set(key, output)
+    return output
+
+
+@register.simple_tag(takes_context=True)
+def url_breadcrumbs_jsonld(context, request):
+    """
+    Template tag rendering the breadcrumb trail for ``request`` as a
+    schema.org ``BreadcrumbList`` in a JSON-LD script element::
+
+        {% url_breadcrumbs_jsonld request %}
+
+    The trail is the same one the ``url_breadcrumbs`` tag renders, and is
+    built only once when both tags are used, see :func:`url_breadcrumbs`.
+    Output is cached like rendered HTML, see :func:`get_html_cache`.
+    """
+    jsonld = _render_structured_data(context, request, 'json-ld', to_jsonld)
+    return mark_safe(
+        '<script type="application/ld+json">%s</script>' % jsonld)
+
+
+@register.simple_tag(takes_context=True)
+def url_breadcrumbs_json(context, request):
+    """
+    Template tag rendering the breadcrumb trail for ``request`` as a plain
+    JSON list, see :func:`url_breadcrumbs.structured_data.to_json`.
+    """
+    return _render_structured_data(context, request, 'json', to_json)
@@ -1,7 +1,9 @@
 from django.test import TestCase
 from django.template import Context, Template
 from django.test.client import RequestFactory
+from django.test.utils import override_settings
 from django.conf import settings
+from django.db import models
 
 
 class UrlBreadcrumbsTest(TestCase):
@@ -151,3 +153,1554 @@ class UrlBreadcrumbsTest(TestCase):
         html = self.template.render(context)
         self.assertIn(
             '<span class="crumb-final">Title of FeinCMS Page</span>', html)
+
+
+class NameCacheTest(TestCase):
+
+    def setUp(self):
+        from url_breadcrumbs.templatetags import url_breadcrumbs_tags
+        self.tags = url_breadcrumbs_tags
+        self.tags.name_cache.clear()
+        self.template = Template(
+            "{% load url_breadcrumbs_tags %}"
+            "{% url_breadcrumbs request %}"
+            )
+        self.request_factory = RequestFactory()
+        settings.URL_BREADCRUMBS_FUNCTIONS = None
+
+    def test_lru_cache_evicts_least_recently_used(self):
+        from url_breadcrumbs.cache import LRUCache
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))  # 'a' is now most recently used
+        cache.set('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(None, cache.get('b'))
+        self.assertEqual(
+            {'hits': 1, 'misses': 1, 'evictions': 1, 'size': 2, 'maxsize': 2},
+            cache.stats())
+        # Shrinking evicts entries immediately
+        cache.maxsize = 1
+        self.assertEqual(1, len(cache))
+        self.assertEqual(2, cache.stats()['evictions'])
+
+    def test_fallback_names_are_cached(self):
+        request = self.request_factory.get('/some-kind/of_url/some-kind')
+        self.template.render(Context({'request': request}))
+        stats = self.tags.name_cache.stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(2, stats['misses'])
+        self.assertEqual('Some Kind', self.tags.name_cache.get('some-kind'))
+
+    def test_handled_fragments_skip_cache(self):
+        request = self.request_factory.get('/some-kind/of_url/path')
+        request.crumbs = {'some-kind': 'Named'}
+        settings.URL_BREADCRUMBS_FUNCTIONS = [
+            lambda ctext, req, frag, is_curr: 'Fn' if frag == 'of_url' else None,
+            ]
+        self.template.render(Context({'request': request}))
+        self.assertNotIn('some-kind', self.tags.name_cache)
+        self.assertNotIn('of_url', self.tags.name_cache)
+        self.assertIn('path', self.tags.name_cache)
+
+    def test_cache_size_setting(self):
+        with override_settings(URL_BREADCRUMBS_NAME_CACHE_SIZE=0):
+            self.assertEqual('Of Url', self.tags.slug_to_name('of_url'))
+            self.assertEqual(0, len(self.tags.name_cache))
+        with override_settings(URL_BREADCRUMBS_NAME_CACHE_SIZE=1):
+            self.tags.slug_to_name('of_url')
+            self.tags.slug_to_name('some-kind')
+            self.assertEqual(1, len(self.tags.name_cache))
+            self.assertIn('some-kind', self.tags.name_cache)
+
+
+class TrailCacheTest(TestCase):
+
+    def setUp(self):
+        from url_breadcrumbs.templatetags import url_breadcrumbs_tags
+        self.tags = url_breadcrumbs_tags
+        self.template = Template(
+            "{% load url_breadcrumbs_tags %}"
+            "{% url_breadcrumbs request %}"
+            )
+        self.request_factory = RequestFactory()
+        self.calls = []
+        from url_breadcrumbs.crumb_fns import context_independent
+
+        @context_independent
+        def counting_fn(ctext, req, frag, is_curr):
+            self.calls.append(frag)
+            return None
+        settings.URL_BREADCRUMBS_FUNCTIONS = [counting_fn]
+
+    def tearDown(self):
+        settings.URL_BREADCRUMBS_FUNCTIONS = None
+
+    def _render(self, path, **request_attrs):
+        request = self.request_factory.get(path)
+        for name, value in request_attrs.items():
+            setattr(request, name, value)
+        return self.template.render(Context({'request': request}))
+
+    def test_trail_cache_disabled_by_default(self):
+        self.assertEqual(None, self.tags.get_trail_cache())
+        self._render('/a/b')
+        self._render('/a/b')
+        self.assertEqual(['a', 'b', 'a', 'b'], self.calls)
+
+    @override_settings(URL_BREADCRUMBS_TRAIL_CACHE='memory')
+    def test_memory_trail_cache(self):
+        self.tags.invalidate_trail()
+        html = self._render('/a/b')
+        self.assertEqual(html, self._render('/a/b'))
+        self.assertEqual(['a', 'b'], self.calls)
+        # Request overrides bypass the cache
+        html = self._render('/a/b', crumb='Override')
+        self.assertIn('<span class="crumb-final">Override</span>', html)
+        self.assertEqual(['a', 'b', 'a'], self.calls)
+        # Explicit invalidation
+        self.tags.invalidate_trail('/a/b')
+        self._render('/a/b')
+        self.assertEqual(['a', 'b', 'a', 'a', 'b'], self.calls)
+
+    @override_settings(URL_BREADCRUMBS_TRAIL_CACHE='memory')
+    def test_context_dependent_functions_disable_trail_cache(self):
+        self.tags.invalidate_trail()
+        settings.URL_BREADCRUMBS_FUNCTIONS = [
+            lambda ctext, req, frag, is_curr: self.calls.append(frag)]
+        self._render('/a')
+        self._render('/a')
+        self.assertEqual(['a', 'a'], self.calls)
+
+    @override_settings(
+        URL_BREADCRUMBS_TRAIL_CACHE='default',
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_django_cache_backend(self):
+        self.tags.invalidate_trail()
+        self._render('/a/b')
+        self._render('/a/b')
+        self.assertEqual(['a', 'b'], self.calls)
+        self.tags.invalidate_trail()
+        self._render('/a/b')
+        self.assertEqual(['a', 'b', 'a', 'b'], self.calls)
+
+    def test_settings_resolved_once(self):
+        from url_breadcrumbs.trails import get_trail_config
+        with override_settings(URL_BREADCRUMBS_TRAIL_CACHE='memory'):
+            trail_cache = self.tags.get_trail_cache()
+            self.assertIs(trail_cache, self.tags.get_trail_cache())
+            with override_settings(URL_BREADCRUMBS_TRAIL_CACHE_SIZE=2):
+                self.assertEqual(
+                    2, self.tags.get_trail_cache()._cache.maxsize)
+        self.assertEqual(None, self.tags.get_trail_cache())
+        with override_settings(URL_BREADCRUMBS_TIME_BUDGET=5):
+            config = get_trail_config(crumb_functions=())
+            self.assertEqual(5, config.time_budget)
+            # Only I/O-bound functions need the active language
+            self.assertEqual(None, config.pool_call)
+        self.assertEqual(None, get_trail_config().time_budget)
+
+    def test_per_path_timeouts(self):
+        from url_breadcrumbs.cache import TrailCache
+        cache = TrailCache(timeout=60, timeouts={'/news': 0, '/news/x': 5})
+        self.assertEqual(60, cache.timeout_for('/about'))
+        self.assertEqual(0, cache.timeout_for('/news/y'))
+        self.assertEqual(5, cache.timeout_for('/news/x/1'))
+        cache.set('/news/y', 'Home', [('/', '/', 'Home')])
+        self.assertEqual(None, cache.get('/news/y', 'Home'))
+        cache.set('/about', 'Home', [('/', '/', 'Home')])
+        self.assertEqual([('/', '/', 'Home')], cache.get('/about', 'Home'))
+        self.assertEqual(None, cache.get('/about', 'Start'))
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_shared_alias_invalidated_across_processes(self):
+        from django.core.cache import cache as default_cache
+        from url_breadcrumbs.cache import TrailCache
+        # Two processes sharing one cache alias
+        trail_cache = TrailCache('default', maxsize=1)
+        other_cache = TrailCache('default', maxsize=1)
+        default_cache.set('session:abc', 'data')
+        paths = ['/about/p%d' % i for i in range(6)] + ['/other']
+        for path in paths:
+            trail_cache.set(path, 'Home', [('/', '/', 'Home')])
+        self.assertEqual(
+            [('/', '/', 'Home')], other_cache.get(paths[0], 'Home'))
+        other_cache.invalidate_prefix('/about/')
+        self.assertEqual([None] * 6, [
+            trail_cache.get(path, 'Home') for path in paths[:6]])
+        self.assertEqual(
+            [('/', '/', 'Home')], trail_cache.get('/other', 'Home'))
+        self.assertEqual('data', default_cache.get('session:abc'))
+        # Trails cached after invalidation are found again
+        trail_cache.set(paths[0], 'Home', [('/', '/', 'Start')])
+        self.assertEqual(
+            [('/', '/', 'Start')], other_cache.get(paths[0], 'Home'))
+        other_cache.invalidate_prefix('/')
+        self.assertEqual(None, trail_cache.get('/other', 'Home'))
+
+
+class HtmlCacheTest(TestCase):
+
+    def setUp(self):
+        from url_breadcrumbs.templatetags import url_breadcrumbs_tags
+        self.tags = url_breadcrumbs_tags
+        self.template = Template(
+            "{% load url_breadcrumbs_tags %}"
+            "{% url_breadcrumbs request %}"
+            )
+        self.request_factory = RequestFactory()
+        settings.URL_BREADCRUMBS_FUNCTIONS = None
+
+    def _render(self, path, context_items=None):
+        context = Context({'request': self.request_factory.get(path)})
+        context.update(context_items or {})
+        return self.template.render(context)
+
+    @override_settings(URL_BREADCRUMBS_HTML_CACHE='memory')
+    def test_rendered_html_is_cached(self):
+        html_cache = self.tags.get_html_cache()
+        html_cache.clear()
+        html = self._render('/some-kind/of_url/path')
+        self.assertEqual(1, len(html_cache._cache))
+        self.assertEqual(html, self._render('/some-kind/of_url/path'))
+        self.assertEqual(1, html_cache._cache.hits)
+        # Delimiter is part of the key
+        html = self._render('/some-kind/of_url/path', {'crumb_delim': '|'})
+        self.assertIn('<span class="crumb-delim">|</span>', html)
+        self.assertEqual(2, len(html_cache._cache))
+
+    def test_key_versioning(self):
+        from url_breadcrumbs.cache import HtmlCache
+        crumbs = [('/', '/', 'Home'), ('/a', 'a', 'A')]
+        key = HtmlCache().make_key('t.html', 'src', crumbs, '|')
+        self.assertEqual(key, HtmlCache().make_key('t.html', 'src', crumbs, '|'))
+        self.assertNotEqual(
+            key, HtmlCache(version='r2').make_key('t.html', 'src', crumbs, '|'))
+        self.assertNotEqual(
+            key, HtmlCache().make_key('t.html', 'src2', crumbs, '|'))
+        self.assertNotEqual(
+            key, HtmlCache().make_key('t.html', 'src', crumbs[:1], '|'))
+
+
+def dotted_path_crumb_fn(context, request, path_fragment, is_current_page):
+    return 'Dotted' if is_current_page else None
+
+
+class PipelineTest(TestCase):
+
+    def setUp(self):
+        self.template = Template(
+            "{% load url_breadcrumbs_tags %}"
+            "{% url_breadcrumbs request %}"
+            )
+        self.request_factory = RequestFactory()
+        settings.URL_BREADCRUMBS_FUNCTIONS = None
+
+    def test_build_pipeline(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from url_breadcrumbs.crumb_fns import feincms_page_title
+        from url_breadcrumbs.pipeline import build_pipeline
+        self.assertEqual((), build_pipeline(None))
+        self.assertEqual(
+            (feincms_page_title, dotted_path_crumb_fn),
+            build_pipeline([
+                'url_breadcrumbs.crumb_fns.feincms_page_title',
+                dotted_path_crumb_fn,
+                ]))
+        for invalid in (1, 'url_breadcrumbs.crumb_fns.feincms_page_title',
+                        ['url_breadcrumbs.crumb_fns.no_such_fn'], [1]):
+            self.assertRaises(ImproperlyConfigured, build_pipeline, invalid)
+
+    @override_settings(URL_BREADCRUMBS_FUNCTIONS=[
+        'url_breadcrumbs.tests.dotted_path_crumb_fn'])
+    def test_setting_changed_rebuilds_pipeline(self):
+        from url_breadcrumbs.pipeline import get_pipeline
+        self.assertEqual((dotted_path_crumb_fn,), get_pipeline())
+        request = self.request_factory.get('/some-kind/path')
+        html = self.template.render(Context({'request': request}))
+        self.assertIn('<span class="crumb-final">Dotted</span>', html)
+
+
+class BuildTrailsTest(TestCase):
+
+    def test_build_trails(self):
+        from url_breadcrumbs.trails import build_trails
+        trails = build_trails(['/some-kind/of_url', '/other/'],
+                              crumb_functions=())
+        self.assertEqual(
+            ('/some-kind/of_url', (
+                ('/', '/', 'Home'),
+                ('/some-kind', 'some-kind', 'Some Kind'),
+                ('/some-kind/of_url', 'of_url', 'Of Url'),
+                )),
+            next(trails))
+        self.assertEqual(
+            ('/other/', (('/', '/', 'Home'), ('/other', 'other', 'Other'))),
+            next(trails))
+        self.assertRaises(StopIteration, next, trails)
+
+    def test_shared_prefixes_are_named_once(self):
+        from url_breadcrumbs.trails import build_trails
+        calls = []
+
+        def counting_fn(ctext, req, frag, is_curr):
+            calls.append((frag, is_curr))
+            return 'Skip' if frag == 'skip' else None
+        trails = dict(build_trails(
+            ['/a/b/c', '/a/b/d', '/a/b', '/a/skip/e'],
+            crumb_home_name='Start', crumbs={'e': None},
+            crumb_functions=[counting_fn]))
+        self.assertEqual(
+            [('a', False), ('b', False), ('c', True), ('d', True),
+             ('b', True), ('skip', False)],
+            calls)
+        self.assertEqual(('/', '/', 'Start'), trails['/a/b'][0])
+        self.assertEqual(
+            [('/', '/', 'Start'), ('/a', 'a', 'A'),
+             ('/a/skip', 'skip', 'Skip')],
+            list(trails['/a/skip/e']))
+
+    def test_overrides_match_build_crumbs(self):
+        from url_breadcrumbs.index import CrumbIndex
+        from url_breadcrumbs.trails import build_crumbs, build_trails
+        index = CrumbIndex({'/a/b': 'Indexed'})
+        request = RequestFactory().get('/a/b/c')
+        request.crumb = 'Current'
+        request.crumbs = {'a': 'Renamed'}
+        [(path, trail)] = build_trails(
+            ['/a/b/c'], crumbs=request.crumbs, crumb_functions=(),
+            crumb_index=index, crumb='Current')
+        self.assertEqual(
+            list(build_crumbs({}, request, crumb_functions=(),
+                              crumb_index=index)),
+            list(trail))
+        self.assertEqual('Current', trail[-1][2])
+        trails = dict(build_trails(
+            ['/a', '/a/b'], crumb_functions=(), crumb=None))
+        self.assertEqual([('/', '/', 'Home')], list(trails['/a']))
+        self.assertEqual(
+            [('/', '/', 'Home'), ('/a', 'a', 'A')], list(trails['/a/b']))
+
+
+class CrumbIndexTest(TestCase):
+
+    def setUp(self):
+        from url_breadcrumbs.index import CrumbIndex
+        self.index = CrumbIndex({
+            '/shop': 'Shop',
+            '/shop/books': 'Books for Sale',
+            '/library/books': 'Lending Books',
+            '/library/hidden': '',
+            })
+
+    def test_insert_lookup_and_delete(self):
+        self.assertEqual(4, len(self.index))
+        self.assertEqual('Books for Sale', self.index.get('/shop/books/'))
+        self.assertEqual(None, self.index.get('/library'))
+        self.assertEqual(None, self.index.get('/library/books/x'))
+        self.assertEqual(['Shop', 'Books for Sale'],
+                         self.index.walk(['shop', 'books', 'x']))
+        self.assertEqual([None, 'Lending Books'],
+                         self.index.walk(['library', 'books']))
+        self.index.insert('/shop/books', 'Books')
+        self.assertEqual(4, len(self.index))
+        self.assertEqual('Books', self.index.get('/shop/books'))
+        self.index.delete('/shop')
+        self.assertNotIn('/shop', self.index)
+        self.assertIn('/shop/books', self.index)
+        self.index.delete('/library/books')
+        self.assertEqual([None, ''], self.index.walk(['library', 'hidden']))
+        self.index.delete('/library/hidden')
+        self.assertEqual({'shop'}, set(self.index._root.children))
+        self.assertRaises(KeyError, self.index.delete, '/library')
+
+    def test_root_path(self):
+        self.assertNotIn('/', self.index)
+        self.assertEqual('Nothing', self.index.get('', 'Nothing'))
+        self.index.insert('/', 'Start')
+        self.assertEqual(5, len(self.index))
+        self.assertIn('/', self.index)
+        self.assertEqual('Start', self.index.get(''))
+        self.assertEqual('Shop', self.index.get('/shop'))
+        self.index.delete('/')
+        self.assertEqual(None, self.index.get('/'))
+        self.assertRaises(KeyError, self.index.delete, '/')
+
+    def test_from_fixture(self):
+        import json
+        import tempfile
+        from url_breadcrumbs.index import CrumbIndex
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            json.dump([{'path': '/a/b', 'name': 'B'}], f)
+            f.flush()
+            self.assertEqual('B', CrumbIndex.from_fixture(f.name).get('/a/b'))
+
+    def test_index_used_by_template_tag(self):
+        template = Template(
+            "{% load url_breadcrumbs_tags %}"
+            "{% url_breadcrumbs request %}"
+            )
+        request = RequestFactory().get('/library/books/hidden')
+        request.crumbs = {'hidden': 'Shown'}
+        with override_settings(URL_BREADCRUMBS_INDEX=self.index):
+            html = template.render(Context({'request': request}))
+        self.assertIn('<a href="/library">Library</a>', html)
+        self.assertIn('<a href="/library/books">Lending Books</a>', html)
+        self.assertIn('<span class="crumb-final">Shown</span>', html)
+
+
+class FakePage(models.Model):
+    """In-memory stand-in for a FeinCMS page, used by PageTreeTitlesTest"""
+    id = models.AutoField(primary_key=True)
+    title = models.CharField(max_length=100)
+    _cached_url = models.CharField(max_length=255)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        app_label = 'url_breadcrumbs'
+
+
+class PageTreeTitlesTest(TestCase):
+
+    def setUp(self):
+        from url_breadcrumbs.crumb_fns import PageTreeTitles
+        for url, title in (('/about/', 'About Us'),
+                           ('/about/team/', 'Our Team'),
+                           ('/about/team/jo/', 'Jo Bloggs')):
+            FakePage.objects.create(title=title, _cached_url=url)
+        self.titles = PageTreeTitles('url_breadcrumbs.FakePage')
+        self.template = Template(
+            "{% load url_breadcrumbs_tags %}"
+            "{% url_breadcrumbs request %}"
+            )
+
+    def tearDown(self):
+        settings.URL_BREADCRUMBS_FUNCTIONS = None
+
+    def test_ancestors_named_in_one_query(self):
+        settings.URL_BREADCRUMBS_FUNCTIONS = [self.titles]
+        request = RequestFactory().get('/about/team/jo/cv')
+        with self.assertNumQueries(1):
+            html = self.template.render(Context({'request': request}))
+        self.assertIn('<a href="/about">About Us</a>', html)
+        self.assertIn('<a href="/about/team">Our Team</a>', html)
+        self.assertIn('<a href="/about/team/jo">Jo Bloggs</a>', html)
+        self.assertIn('<span class="crumb-final">Cv</span>', html)
+        # Titles are cached per path until the page tree changes
+        with self.assertNumQueries(0):
+            self.template.render(Context({'request': request}))
+        FakePage.objects.filter(title='Our Team').update(title='Team')
+        with self.assertNumQueries(0):
+            self.template.render(Context({'request': request}))
+        FakePage.objects.get(title='About Us').save()
+        with self.assertNumQueries(1):
+            html = self.template.render(Context({'request': request}))
+        self.assertIn('<a href="/about/team">Team</a>', html)
+
+    @override_settings(URL_BREADCRUMBS_PAGE_TREE_CACHE='default',
+                       CACHES={'default': {
+                           'BACKEND': 'django.core.cache.backends.locmem.'
+                                      'LocMemCache'}})
+    def test_versions_shared_between_processes(self):
+        from django.core.cache import cache
+        from url_breadcrumbs.crumb_fns import bump_page_tree_version
+        key = 'url_breadcrumbs:page_tree:url_breadcrumbs.FakePage'
+        path = '/about/team/jo/'
+        cache.delete(key)
+        with self.assertNumQueries(1):
+            self.titles.titles_for_path(path)
+            self.titles.titles_for_path(path)
+        # Versions are bumped in the shared cache, seen by every process
+        bump_page_tree_version(FakePage)
+        self.assertEqual(1, cache.get(key))
+        cache.incr(key)
+        with self.assertNumQueries(1):
+            self.titles.titles_for_path(path)
+            self.titles.titles_for_path(path)
+
+    def test_titles_expire(self):
+        from url_breadcrumbs.crumb_fns import PageTreeTitles
+        titles = PageTreeTitles(FakePage, timeout=0)
+        with self.assertNumQueries(2):
+            titles.titles_for_path('/about/')
+            titles.titles_for_path('/about/')
+
+    def test_queryset_restricts_pages(self):
+        from url_breadcrumbs.crumb_fns import PageTreeTitles
+        FakePage.objects.filter(title='Our Team').update(active=False)
+        titles = PageTreeTitles(
+            queryset=FakePage.objects.filter(active=True))
+        self.assertEqual(
+            {'/about': 'About Us', '/about/team/jo': 'Jo Bloggs'},
+            titles.titles_for_path('/about/team/jo/'))
+
+
+class BatchedCrumbFunctionsTest(TestCase):
+
+    def setUp(self):
+        self.template = Template(
+            "{% load url_breadcrumbs_tags %}"
+            "{% url_breadcrumbs request %}"
+            )
+        self.calls = []
+
+    def tearDown(self):
+        settings.URL_BREADCRUMBS_FUNCTIONS = None
+
+    def test_batched_function_called_once_per_trail(self):
+        from url_breadcrumbs.crumb_fns import batched
+
+        @batched
+        def batch_fn(ctext, req, items):
+            self.calls.append(items)
+            return {'/a': 'Batch A', '/a/b': 'Batch B', '/a/b/c': ''}
+        settings.URL_BREADCRUMBS_FUNCTIONS = [
+            lambda ctext, req, frag, is_curr: 'Fn B' if frag == 'b' else None,
+            batch_fn,
+            ]
+        request = RequestFactory().get('/a/b/c')
+        request.crumbs = {'a': 'Request A'}
+        html = self.template.render(Context({'request': request}))
+        # Fragments named by the request are not passed to batched functions
+        self.assertEqual(
+            [[('/a/b', 'b', False), ('/a/b/c', 'c', True)]], self.calls)
+        self.assertIn('<a href="/a">Request A</a>', html)
+        # Functions are consulted in order
+        self.assertIn('<span class="crumb-final">Fn B</span>', html)
+
+    def test_failing_batched_function_is_ignored(self):
+        from url_breadcrumbs.crumb_fns import batched
+        from url_breadcrumbs.trails import build_trails
+        broken = batched(lambda ctext, req, items: 1 / 0)
+        [(path, trail)] = build_trails(['/a'], crumb_functions=[broken])
+        self.assertEqual((('/', '/', 'Home'), ('/a', 'a', 'A')), trail)
+
+
+class AsyncCrumbsTest(TestCase):
+
+    async def test_async_and_sync_functions(self):
+        import asyncio
+        from url_breadcrumbs.trails import abuild_crumbs
+        started = []
+
+        async def slow_fn(ctext, req, frag, is_curr):
+            started.append(frag)
+            await asyncio.sleep(0.05)
+            # All fragments are being named concurrently
+            self.assertEqual(3, len(started))
+            return 'Async %s' % frag if frag != 'c' else None
+
+        def sync_fn(ctext, req, frag, is_curr):
+            return 'Sync %s' % frag
+
+        request = RequestFactory().get('/a/b/c')
+        crumbs = await abuild_crumbs(
+            {}, request, crumb_functions=[slow_fn, sync_fn])
+        self.assertEqual(
+            [('/', '/', 'Home'), ('/a', 'a', 'Async a'),
+             ('/a/b', 'b', 'Async b'), ('/a/b/c', 'c', 'Sync c')],
+            crumbs)
+
+    async def test_timeout_falls_back_to_slug_title(self):
+        import asyncio
+        from url_breadcrumbs.trails import abuild_crumbs
+
+        async def slow_fn(ctext, req, frag, is_curr):
+            if frag == 'slow':
+                await asyncio.sleep(1)
+            return 'Named'
+
+        request = RequestFactory().get('/fast/slow')
+        crumbs = await abuild_crumbs(
+            {}, request, crumb_functions=[slow_fn, slow_fn], timeout=0.01)
+        self.assertEqual(
+            [('/', '/', 'Home'), ('/fast', 'fast', 'Named'),
+             ('/fast/slow', 'slow', 'Slow')],
+            crumbs)
+
+    async def test_sync_functions_see_active_language(self):
+        from django.utils import translation
+        from url_breadcrumbs.trails import abuild_crumbs
+
+        def language_fn(ctext, req, frag, is_curr):
+            return translation.get_language()
+
+        request = RequestFactory().get('/a')
+        with translation.override('fr'):
+            crumbs = await abuild_crumbs(
+                {}, request, crumb_functions=[language_fn])
+        self.assertEqual(('/a', 'a', 'fr'), crumbs[-1])
+
+
+class InstrumentationTest(TestCase):
+
+    def setUp(self):
+        from url_breadcrumbs import instrumentation
+        self.instrumentation = instrumentation
+        instrumentation.reset()
+
+    def tearDown(self):
+        self.instrumentation.reset()
+
+    def test_disabled_by_default(self):
+        from url_breadcrumbs.trails import build_crumbs
+        self.assertFalse(self.instrumentation.enabled)
+        build_crumbs({}, RequestFactory().get('/a'),
+                     crumb_functions=[lambda c, r, f, i: None])
+        stats = self.instrumentation.get_stats()
+        self.assertEqual({}, stats['functions'])
+        self.assertEqual(0, stats['trails']['calls'])
+
+    @override_settings(URL_BREADCRUMBS_INSTRUMENTATION=True)
+    def test_function_and_trail_stats(self):
+        from url_breadcrumbs.signals import trail_built
+        from url_breadcrumbs.trails import build_crumbs
+
+        def broken_fn(ctext, req, frag, is_curr):
+            raise ValueError()
+
+        def naming_fn(ctext, req, frag, is_curr):
+            return 'Named' if frag == 'b' else None
+
+        built = []
+
+        def receiver(sender, path, duration, **kwargs):
+            built.append(path)
+        trail_built.connect(receiver)
+        try:
+            build_crumbs({}, RequestFactory().get('/a/b'),
+                         crumb_functions=[broken_fn, naming_fn])
+        finally:
+            trail_built.disconnect(receiver)
+        self.assertEqual(['/a/b'], built)
+        stats = self.instrumentation.get_stats()
+        broken = stats['functions'][
+            'url_breadcrumbs.tests.%s' % broken_fn.__qualname__]
+        naming = stats['functions'][
+            'url_breadcrumbs.tests.%s' % naming_fn.__qualname__]
+        self.assertEqual((2, 2, 0), (
+            broken['calls'], broken['errors'], broken['wins']))
+        self.assertEqual((2, 0, 1), (
+            naming['calls'], naming['errors'], naming['wins']))
+        self.assertTrue(naming['p99'] >= naming['p50'] >= 0)
+        self.assertEqual(1, stats['trails']['calls'])
+        self.assertTrue(stats['trails']['total_time'] > 0)
+
+    @override_settings(URL_BREADCRUMBS_INSTRUMENTATION=True)
+    def test_stats_kept_per_callable(self):
+        from url_breadcrumbs.crumb_fns import PageTreeTitles
+        from url_breadcrumbs.trails import build_crumbs
+        first = lambda c, r, f, i: None
+        second = lambda c, r, f, i: 'Named'
+        labelled = lambda c, r, f, i: None
+        labelled.crumb_label = 'labelled'
+        pages = PageTreeTitles(FakePage)
+        other_pages = PageTreeTitles(FakePage, url_field='title')
+        build_crumbs({}, RequestFactory().get('/a'), crumb_functions=[
+            first, second, labelled, pages, other_pages])
+        functions = self.instrumentation.get_stats()['functions']
+        label = self.instrumentation.function_label
+        self.assertEqual(5, len(set(map(label, [
+            first, second, labelled, pages, other_pages]))))
+        self.assertEqual('labelled', label(labelled))
+        self.assertEqual(
+            "url_breadcrumbs.crumb_fns.PageTreeTitles("
+            "'url_breadcrumbs.FakePage')", label(pages))
+        self.assertEqual(label(pages) + ' #2', label(other_pages))
+        self.assertEqual(0, functions[label(first)]['wins'])
+        self.assertEqual(1, functions[label(second)]['wins'])
+
+
+class BreadcrumbsMiddlewareTest(TestCase):
+
+    def setUp(self):
+        from url_breadcrumbs.middleware import BreadcrumbsMiddleware
+        self.template = Template(
+            "{% load url_breadcrumbs_tags %}"
+            "{% url_breadcrumbs request %}{% url_breadcrumbs request %}"
+            )
+        self.calls = []
+        settings.URL_BREADCRUMBS_FUNCTIONS = [
+            lambda ctext, req, frag, is_curr: self.calls.append(frag)]
+        self.request = RequestFactory().get('/a/b')
+        BreadcrumbsMiddleware(lambda request: None)(self.request)
+
+    def tearDown(self):
+        settings.URL_BREADCRUMBS_FUNCTIONS = None
+
+    def test_trail_built_once_on_first_access(self):
+        self.assertEqual([], self.calls)
+        html = self.template.render(Context({'request': self.request}))
+        self.assertEqual(2, html.count('<span class="crumb-final">B</span>'))
+        self.assertEqual(['a', 'b'], self.calls)
+        self.assertEqual(1, self.request.breadcrumbs.builds)
+        self.assertEqual(('/a/b', 'b', 'B'), self.request.breadcrumbs[-1])
+        self.assertEqual(3, len(self.request.breadcrumbs))
+
+    def test_request_overrides_rebuild_trail(self):
+        list(self.request.breadcrumbs)
+        self.request.crumb = 'Current'
+        html = self.template.render(Context({'request': self.request}))
+        self.assertIn('<span class="crumb-final">Current</span>', html)
+        self.request.crumbs = {'a': 'First'}
+        self.assertEqual(('/a', 'a', 'First'), self.request.breadcrumbs[1])
+        self.request.crumbs['a'] = 'Changed'
+        self.assertEqual(('/a', 'a', 'Changed'), self.request.breadcrumbs[1])
+        self.assertEqual(4, self.request.breadcrumbs.builds)
+
+    def test_contextless_trail_rebuilt_for_template_context(self):
+        from url_breadcrumbs.crumb_fns import context_independent
+        from url_breadcrumbs.middleware import LazyBreadcrumbs
+        settings.URL_BREADCRUMBS_FUNCTIONS = [
+            lambda ctext, req, frag, is_curr: ctext.get('title')]
+        self.request.breadcrumbs.fingerprint()
+        html = self.template.render(
+            Context({'request': self.request, 'title': 'Page Title'}))
+        self.assertIn('<span class="crumb-final">Page Title</span>', html)
+        self.assertEqual(2, self.request.breadcrumbs.builds)
+        # Context independent functions reuse the trail built for the ETag
+        settings.URL_BREADCRUMBS_FUNCTIONS = [context_independent(
+            lambda ctext, req, frag, is_curr: ctext.get('title'))]
+        self.request.breadcrumbs = LazyBreadcrumbs(self.request)
+        self.request.breadcrumbs.fingerprint()
+        self.template.render(
+            Context({'request': self.request, 'title': 'Page Title'}))
+        self.assertEqual(1, self.request.breadcrumbs.builds)
+
+
+class CrumbTest(TestCase):
+
+    def test_crumbs_share_trail_path(self):
+        import pickle
+        from url_breadcrumbs.trails import Trail, build_crumbs
+        trail = build_crumbs({}, RequestFactory().get('/a//b-c/'),
+                             crumb_functions=())
+        self.assertTrue(isinstance(trail, Trail))
+        self.assertEqual('/a/b-c', trail.path)
+        home, first, last = trail
+        crumb_path, path_fragment, crumb_name = last
+        self.assertEqual(('/a/b-c', 'b-c', 'B C'),
+                         (crumb_path, path_fragment, crumb_name))
+        self.assertEqual(('/a', 'a', 'A'), first)
+        self.assertEqual(('/', '/', 'Home'), home)
+        self.assertEqual('/a', first.path)
+        self.assertEqual('a', first[1])
+        self.assertTrue(first.source is last.source is trail.path)
+        self.assertEqual(trail, pickle.loads(pickle.dumps(trail)))
+        self.assertEqual('/a/b-c', pickle.loads(pickle.dumps(trail)).path)
+
+    def test_prefix_paths_sliced_only_when_used(self):
+        from url_breadcrumbs.core import (
+            TrailConfig, join_trail, name_crumbs, split_trail)
+        items, names, pending = split_trail('/a/b/c', crumbs={'a': 'A'})
+        self.assertEqual([None, None, None], [item._path for item in items])
+        config = TrailConfig(crumb_functions=[
+            lambda ctext, req, frag, is_curr: frag.upper()])
+        self.assertEqual(['B', 'C'], name_crumbs(
+            config, {}, None, [items[i] for i in pending]))
+        self.assertEqual([None, None, None], [item._path for item in items])
+        names[1:] = ['B', 'C']
+        trail = join_trail('Home', items, names)
+        self.assertEqual(None, trail[-1]._path)
+        self.assertEqual('/a/b/c', trail[-1].path)
+        self.assertTrue(trail[-1].path is trail[-1].path)
+        # Items still unpack like tuples for batched functions
+        self.assertEqual(('/a/b', 'b', False), items[1])
+        self.assertEqual(['/a', '/a/b', '/a/b/c'],
+                         [crumb_path for crumb_path, _, _ in items])
+
+
+class PythonRendererTest(TestCase):
+
+    def setUp(self):
+        settings.URL_BREADCRUMBS_FUNCTIONS = None
+        self.request_factory = RequestFactory()
+
+    def _render(self, template_code, path, context_items=None):
+        context = Context({'request': self.request_factory.get(path)})
+        context.update(context_items or {})
+        return Template(
+            "{% load url_breadcrumbs_tags %}" + template_code).render(context)
+
+    def test_output_identical_to_template(self):
+        from django.utils.safestring import mark_safe
+        cases = [
+            ('/', {}),
+            ('/some-kind/of_url/path', {}),
+            ('/a/b', {'crumb_delim': '<b>|</b>',
+                      'crumb_home_name': 'Home & <Away>'}),
+            ('/a/b', {'crumb_home_name': mark_safe('<i>Home</i>')}),
+            ('/a/b', {'crumb_delim': '<b>x</b> <i>y</i>'}),
+            ('/a/b', {'crumb_delim': ' ', 'crumb_home_name': ' '}),
+            ('/a/b', {'crumb_home_name': mark_safe('<i>a</i>\n <i>b</i>')}),
+            ]
+        for path, context_items in cases:
+            for wrapper in ('%s', '{%% autoescape off %%}%s{%% endautoescape %%}'):
+                expected = self._render(
+                    wrapper % '{% url_breadcrumbs request %}',
+                    path, context_items)
+                html = self._render(
+                    wrapper % "{% url_breadcrumbs request renderer='python' %}",
+                    path, context_items)
+                self.assertEqual(expected, html)
+        self.assertIn('Home &amp; &lt;Away&gt;', self._render(
+            "{% url_breadcrumbs request renderer='python' %}", '/a',
+            {'crumb_home_name': 'Home & <Away>'}))
+
+    @override_settings(URL_BREADCRUMBS_RENDERER='python')
+    def test_renderer_setting(self):
+        from url_breadcrumbs.templatetags.url_breadcrumbs_tags import (
+            render_crumbs)
+        from django.template import TemplateSyntaxError
+        html = self._render("{% url_breadcrumbs request %}", '/a')
+        self.assertIn('<a href="/">Home</a>', html)
+        self.assertRaises(TemplateSyntaxError, render_crumbs, Context(),
+                          {'crumbs': [], 'crumb_delim': '|'}, renderer='x')
+
+
+class StructuredDataTest(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        settings.URL_BREADCRUMBS_FUNCTIONS = [
+            lambda ctext, req, frag, is_curr: self.calls.append(frag)]
+
+    def tearDown(self):
+        settings.URL_BREADCRUMBS_FUNCTIONS = None
+
+    def test_jsonld_tag_shares_trail(self):
+        import json
+        template = Template(
+            "{% load url_breadcrumbs_tags %}"
+            "{% url_breadcrumbs request %}"
+            "{% url_breadcrumbs_jsonld request %}"
+            )
+        request = RequestFactory().get('/a/b<c>')
+        html = template.render(Context({'request': request}))
+        self.assertEqual(['a', 'b<c>'], self.calls)
+        # Only the trusted markup of the script element is unescaped
+        self.assertEqual(1, html.count('<script'))
+        self.assertIn('"name":"B\\u003CC\\u003E"', html)
+        start = html.index('<script type="application/ld+json">')
+        data = json.loads(html[start + 35:-len('</script>')])
+        self.assertEqual({
+            '@context': 'https://schema.org',
+            '@type': 'BreadcrumbList',
+            'itemListElement': [
+                {'@type': 'ListItem', 'position': 1, 'name': 'Home',
+                 'item': 'http://testserver/'},
+                {'@type': 'ListItem', 'position': 2, 'name': 'A',
+                 'item': 'http://testserver/a'},
+                {'@type': 'ListItem', 'position': 3, 'name': 'B<C>',
+                 'item': 'http://testserver/a/b%3Cc%3E'},
+                ]}, data)
+
+    def test_plain_json(self):
+        import json
+        from url_breadcrumbs.structured_data import to_json
+        crumbs = [('/', '/', 'Home'), ('/caf\xe9', 'caf\xe9', 'Caf\xe9 "&"')]
+        self.assertEqual(
+            [{'name': 'Home', 'path': '/', 'url': 'https://x.org/'},
+             {'name': 'Caf\xe9 "&"', 'path': '/caf\xe9',
+              'url': 'https://x.org/caf\xe9'}],
+            json.loads(to_json(crumbs, base_url='https://x.org')))
+        self.assertNotIn('&', to_json(crumbs, base_url='https://x.org'))
+
+
+class CrumbTableTest(TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+        settings.URL_BREADCRUMBS_FUNCTIONS = None
+
+    def test_build_command_and_lookup(self):
+        import os
+        from django.core.management import call_command
+        from url_breadcrumbs.table import CrumbTable
+        source = os.path.join(self.tmpdir, 'crumbs.tsv')
+        table_file = os.path.join(self.tmpdir, 'crumbs.table')
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write('/shop/\tShop\n/shop/books\tB\xf6oks\n/a\tA\n/a/b/c\t\n')
+        call_command('build_crumb_table', source, table_file,
+                     stdout=open(os.devnull, 'w'))
+        table = CrumbTable(table_file)
+        self.assertEqual(4, len(table))
+        self.assertEqual('Shop', table.lookup('/shop'))
+        self.assertEqual('B\xf6oks', table.lookup('/shop/books/'))
+        self.assertEqual('', table.lookup('/a/b/c'))
+        for missing in ('/', '/a/b', '/shop/book', '/zzz'):
+            self.assertEqual(None, table.lookup(missing))
+
+        settings.URL_BREADCRUMBS_FUNCTIONS = [table]
+        template = Template(
+            "{% load url_breadcrumbs_tags %}"
+            "{% url_breadcrumbs request %}"
+            )
+        request = RequestFactory().get('/shop/books/x')
+        html = template.render(Context({'request': request}))
+        self.assertIn('<a href="/shop/books">B\xf6oks</a>', html)
+
+        # Replaced tables are mapped again
+        from url_breadcrumbs.table import write_table
+        write_table([('/shop', 'Store')], table_file)
+        self.assertEqual('Store', table.lookup('/shop'))
+        self.assertEqual(1, len(table))
+
+
+class WarmupTest(TestCase):
+
+    def test_read_paths(self):
+        from url_breadcrumbs.warmup import read_paths
+        self.assertEqual(
+            ['/a/b', '/', '/c d'],
+            list(read_paths(['http://x.org/a/b?q=1\n', '/\n', '# note\n',
+                             '/a/b\n', '/c%20d\n'])))
+        log = [
+            '1.2.3.4 - - [18/Oct/2026:10:00:00 +0000] "GET /a/b HTTP/1.1"'
+            ' 200 512 "-" "agent"\n',
+            '1.2.3.4 - - [18/Oct/2026:10:00:01 +0000] "POST /form HTTP/1.1"'
+            ' 200 512\n',
+            ]
+        self.assertEqual(['/a/b'], list(read_paths(log)))
+        sitemap = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            '<url><loc>https://x.org/news/1</loc></url></urlset>\n',
+            ]
+        self.assertEqual(['/news/1'], list(read_paths(sitemap)))
+
+    def test_errors_logged(self):
+        from unittest import mock
+        from url_breadcrumbs import warmup
+        with mock.patch.object(warmup, 'warm_path',
+                               side_effect=ValueError('broken')):
+            with self.assertLogs('url_breadcrumbs.warmup', 'WARNING') as cm:
+                stats = warmup.warm(['/a'], workers=1)
+        self.assertEqual((0, 1), (stats['paths'], stats['errors']))
+        self.assertIn('/a', cm.output[0])
+        self.assertIn('ValueError: broken', cm.output[0])
+
+    def test_spawned_processes_set_up_django(self):
+        import os
+        import shutil
+        import subprocess
+        import sys
+        import tempfile
+        settings_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, settings_dir)
+        with open(os.path.join(settings_dir, 'warm_settings.py'), 'w') as f:
+            f.write("INSTALLED_APPS = ['url_breadcrumbs']\n"
+                    "SECRET_KEY = 'secret_key'\n"
+                    "TEMPLATES = [{'BACKEND': 'django.template.backends."
+                    "django.DjangoTemplates', 'APP_DIRS': True}]\n")
+        here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='warm_settings',
+                   PYTHONPATH=os.pathsep.join([settings_dir, here]))
+        # Run outside this test process, whose settings are not importable
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import django, multiprocessing;'
+            'from url_breadcrumbs.warmup import warm;'
+            'django.setup();'
+            'print(warm(["/a", "/b"], workers=1, processes=True,'
+            ' mp_context=multiprocessing.get_context("spawn"))["paths"])'
+        ], env=env, cwd=settings_dir)
+        self.assertEqual(b'2', output.strip())
+
+    @override_settings(URL_BREADCRUMBS_TRAIL_CACHE='default',
+                       URL_BREADCRUMBS_FUNCTIONS=None)
+    def test_warm_breadcrumbs_command(self):
+        import os
+        import shutil
+        import tempfile
+        from io import StringIO
+        from django.core.management import CommandError, call_command
+        from url_breadcrumbs.templatetags import url_breadcrumbs_tags
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        with tempfile.NamedTemporaryFile('w', suffix='.txt',
+                                         delete=False) as f:
+            f.write('/a/b\n/a/c\n/a/b\n')
+        self.addCleanup(os.unlink, f.name)
+        # Caches in process memory would be discarded on exit
+        for backend in ('memory', 'default'):
+            with override_settings(URL_BREADCRUMBS_TRAIL_CACHE=backend):
+                self.assertRaises(CommandError, call_command,
+                                  'warm_breadcrumbs', f.name)
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                           'FileBasedCache',
+                'LOCATION': cache_dir}}):
+            url_breadcrumbs_tags.invalidate_trail()
+            out = StringIO()
+            call_command('warm_breadcrumbs', f.name, '--workers=2',
+                         stdout=out)
+            trail_cache = url_breadcrumbs_tags.get_trail_cache()
+            self.assertEqual(
+                ('/a/c', 'c', 'C'), trail_cache.get('/a/c', 'Home')[-1])
+        self.assertIn('Warmed 2 paths (2 trails cached, 0 errors)',
+                      out.getvalue())
+
+
+def url_test_view(request, **kwargs):
+    pass
+
+
+def _urlpatterns():
+    from django.urls import path
+    return [
+        path('news/', url_test_view, {'crumb': 'Latest News'}),
+        path('news/archive/', url_test_view, name='news-archive'),
+        path('news/archive/<int:year>/', url_test_view,
+             {'crumb': lambda match: 'Year %d' % match.kwargs['year']}),
+        ]
+
+
+urlpatterns = _urlpatterns()
+
+
+@override_settings(ROOT_URLCONF='url_breadcrumbs.tests')
+class UrlPatternNamesTest(TestCase):
+
+    def test_names_from_url_patterns(self):
+        from url_breadcrumbs.crumb_fns import UrlPatternNames
+        from url_breadcrumbs.trails import build_crumbs
+        names = UrlPatternNames()
+        request = RequestFactory().get('/news/archive/2012/missing')
+        self.assertEqual(
+            [('/', '/', 'Home'), ('/news', 'news', 'Latest News'),
+             ('/news/archive', 'archive', 'Archive'),
+             ('/news/archive/2012', '2012', 'Year 2012'),
+             ('/news/archive/2012/missing', 'missing', 'Missing')],
+            build_crumbs({}, request, crumb_functions=[names]))
+        # Resolved prefixes are cached
+        self.assertEqual(4, len(names.cache))
+
+        names = UrlPatternNames(use_url_name=True, skip_unresolved=True)
+        request = RequestFactory().get('/news/unknown/archive')
+        self.assertEqual(
+            [('/', '/', 'Home'), ('/news', 'news', 'Latest News'),
+             ('/news/unknown/archive', 'archive', 'Archive')],
+            build_crumbs({}, request, crumb_functions=[names]))
+        request = RequestFactory().get('/news/archive/')
+        self.assertEqual(
+            ('/news/archive', 'archive', 'News Archive'),
+            build_crumbs({}, request, crumb_functions=[names])[-1])
+
+
+@override_settings(URL_BREADCRUMBS_TRAIL_CACHE='memory',
+                   URL_BREADCRUMBS_FUNCTIONS=None)
+class InvalidationTest(TestCase):
+
+    def setUp(self):
+        from url_breadcrumbs import invalidation
+        from url_breadcrumbs.index import CrumbIndex
+        from url_breadcrumbs.templatetags import url_breadcrumbs_tags
+        self.invalidation = invalidation
+        self.index = CrumbIndex({'/about/team': 'Our Team'})
+        invalidation.register(FakePage, 'title', '_cached_url')
+        self.trail_cache = url_breadcrumbs_tags.get_trail_cache()
+        self.trail_cache.clear()
+        self.team = FakePage.objects.create(
+            title='Our Team', _cached_url='/about/team/')
+        for path in ('/about', '/about/team', '/about/team/jo', '/other'):
+            self.trail_cache.set(path, 'Home', [('/', '/', 'Home')])
+
+    def tearDown(self):
+        self.invalidation.unregister(FakePage)
+
+    def _cached(self):
+        return [path for path in
+                ('/about', '/about/team', '/about/team/jo', '/other')
+                if self.trail_cache.get(path, 'Home') is not None]
+
+    def test_unchanged_save_keeps_cache(self):
+        team = FakePage.objects.get(pk=self.team.pk)
+        team.active = False
+        team.save()
+        self.assertEqual(
+            ['/about', '/about/team', '/about/team/jo', '/other'],
+            self._cached())
+
+    def test_changed_title_invalidates_path_and_descendants(self):
+        with override_settings(URL_BREADCRUMBS_INDEX=self.index):
+            team = FakePage.objects.get(pk=self.team.pk)
+            team.title = 'The Team'
+            team.save()
+        self.assertEqual(['/about', '/other'], self._cached())
+        self.assertEqual('The Team', self.index.get('/about/team'))
+
+    def test_deferred_fields_are_not_loaded(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            [team] = FakePage.objects.only('id')
+        self.assertEqual(1, len(queries))
+        team.title = 'The Team'
+        team.save()
+        self.assertEqual(['/about', '/other'], self._cached())
+
+    def test_deferred_path_change_invalidates_old_path(self):
+        team = FakePage.objects.only('id', 'title').get(pk=self.team.pk)
+        team._cached_url = '/other/team/'
+        team.save()
+        self.assertEqual(['/about', '/other'], self._cached())
+
+    def test_callable_paths_called_on_save(self):
+        calls = []
+
+        def page_path(page):
+            calls.append(page.pk)
+            return page._cached_url
+        self.invalidation.unregister(FakePage)
+        self.invalidation.register(FakePage, 'title', page_path)
+        list(FakePage.objects.all())
+        self.assertEqual([], calls)
+        team = FakePage.objects.get(pk=self.team.pk)
+        team.title = 'The Team'
+        team.save()
+        self.assertEqual(['/about', '/other'], self._cached())
+
+    def test_root_page_saved_with_index(self):
+        self.index.insert('/', 'Home')
+        with override_settings(URL_BREADCRUMBS_INDEX=self.index):
+            FakePage.objects.create(title='Start', _cached_url='/')
+        self.assertEqual('Start', self.index.get('/'))
+        # Every cached trail is under the root path
+        self.assertEqual([], self._cached())
+
+    def test_delete_invalidates_path_and_index(self):
+        with override_settings(URL_BREADCRUMBS_INDEX=self.index):
+            self.team.delete()
+        self.assertEqual(['/about', '/other'], self._cached())
+        self.assertNotIn('/about/team', self.index)
+
+
+class TimeBudgetTest(TestCase):
+
+    def setUp(self):
+        from url_breadcrumbs import instrumentation
+        from url_breadcrumbs.trails import build_crumbs
+        self.instrumentation = instrumentation
+        self.build_crumbs = build_crumbs
+        self.instrumentation.reset()
+
+    def tearDown(self):
+        self.instrumentation.reset()
+
+    def test_io_bound_functions_run_concurrently(self):
+        import threading
+        from url_breadcrumbs.crumb_fns import io_bound
+        barrier = threading.Barrier(3, timeout=1)
+
+        @io_bound
+        def waiting_fn(ctext, req, frag, is_curr):
+            # Only returns once all fragments are being named at once
+            barrier.wait()
+            return 'Named %s' % frag
+
+        request = RequestFactory().get('/a/b/c')
+        crumbs = self.build_crumbs({}, request, crumb_functions=[waiting_fn],
+                              time_budget=2)
+        self.assertEqual(
+            ['Home', 'Named a', 'Named b', 'Named c'],
+            [name for _, _, name in crumbs])
+        self.assertFalse(crumbs.degraded)
+
+    def test_budget_falls_back_in_order_and_records_degradation(self):
+        import time
+        from url_breadcrumbs.crumb_fns import io_bound
+        from url_breadcrumbs.signals import trail_degraded
+
+        @io_bound
+        def slow_fn(ctext, req, frag, is_curr):
+            if frag == 'slow':
+                time.sleep(0.5)
+            return 'Slow %s' % frag
+
+        def fast_fn(ctext, req, frag, is_curr):
+            return 'Fast %s' % frag
+
+        degraded = []
+
+        def receiver(sender, path, crumb_paths, **kwargs):
+            degraded.append((path, crumb_paths))
+
+        trail_degraded.connect(receiver)
+        self.instrumentation.enable()
+        try:
+            request = RequestFactory().get('/quick/slow')
+            crumbs = self.build_crumbs(
+                {}, request, crumb_functions=[slow_fn, fast_fn],
+                time_budget=0.1)
+        finally:
+            self.instrumentation.disable()
+            trail_degraded.disconnect(receiver)
+        # fast_fn is not consulted in place of slow_fn
+        self.assertEqual(
+            [('/', '/', 'Home'), ('/quick', 'quick', 'Slow quick'),
+             ('/quick/slow', 'slow', 'Slow')],
+            crumbs)
+        self.assertTrue(crumbs.degraded)
+        self.assertEqual([('/quick/slow', ['/quick/slow'])], degraded)
+        stats = self.instrumentation.get_stats()
+        self.assertEqual(1, stats['trails']['degraded'])
+        self.assertEqual(
+            1, stats['functions'][self.instrumentation.function_label(slow_fn)]
+            ['degraded'])
+
+    def test_io_bound_functions_keep_request_context(self):
+        from unittest import mock
+        from django.utils import translation
+        from url_breadcrumbs.crumb_fns import io_bound
+
+        @io_bound
+        def language_fn(ctext, req, frag, is_curr):
+            return translation.get_language()
+
+        request = RequestFactory().get('/a')
+        with mock.patch('url_breadcrumbs.trails.close_old_connections') as \
+                close_old_connections:
+            with translation.override('fr'):
+                crumbs = self.build_crumbs(
+                    {}, request, crumb_functions=[language_fn])
+        self.assertEqual(('/a', 'a', 'fr'), crumbs[-1])
+        self.assertEqual(2, close_old_connections.call_count)
+
+
+class HumanizerTest(TestCase):
+
+    def test_default_names_match_title_filter(self):
+        from django.template.defaultfilters import title
+        from url_breadcrumbs.names import Humanizer, re_spacify
+        humanizer = Humanizer(keep_identifiers=False)
+        for fragment in ('of_url', 'some-kind', "o'reilly-books",
+                         '3d+x86_64', 'a--b', 'Été_über', 'v2.0', ''):
+            self.assertEqual(title(re_spacify.sub(' ', fragment)),
+                             humanizer(fragment))
+
+    def test_rules(self):
+        from url_breadcrumbs.names import Humanizer
+        humanizer = Humanizer(
+            separators='-.', acronyms=['API', 'FAQ', 'iOS'],
+            stop_words=['and', 'the'], overrides={'faqs': 'Questions'})
+        self.assertEqual('The FAQ and the API',
+                         humanizer('the-faq.and-THE-api'))
+        self.assertEqual('iOS Apps', humanizer('ios-apps'))
+        self.assertEqual('Questions', humanizer('faqs'))
+        # Only the configured separators split words
+        self.assertEqual('Snake_Case', humanizer('snake_case'))
+        # Identifiers are left alone
+        self.assertEqual('1234', humanizer('1234'))
+        self.assertEqual('550e8400-e29b-41d4-a716-446655440000',
+                         humanizer('550e8400-e29b-41d4-a716-446655440000'))
+        self.assertEqual('d41d8cd98f00b204e980',
+                         humanizer('d41d8cd98f00b204e980'))
+
+    def test_lowercase_acronyms_are_not_stop_words(self):
+        from url_breadcrumbs.names import Humanizer
+        humanizer = Humanizer(acronyms=['etc', 'API'], stop_words=['api'])
+        self.assertEqual(frozenset(), humanizer.stop_words)
+        self.assertEqual('etc API', humanizer('etc-api'))
+        humanizer = Humanizer(acronyms=['etc'], stop_words=['and'])
+        self.assertEqual(frozenset(['and']), humanizer.stop_words)
+        self.assertEqual('And etc', humanizer('and-etc'))
+
+    def test_settings(self):
+        from url_breadcrumbs.names import slug_to_name
+        self.assertEqual('Api Faq', slug_to_name('api-faq'))
+        with override_settings(URL_BREADCRUMBS_ACRONYMS=['API', 'FAQ']):
+            self.assertEqual('API FAQ', slug_to_name('api-faq'))
+        self.assertEqual('Api Faq', slug_to_name('api-faq'))
+
+
+def _fake_gettext(message):
+    from django.utils import translation
+    return '%s [%s]' % (message, translation.get_language())
+
+
+def _i18n_urlpatterns():
+    from django.conf.urls.i18n import i18n_patterns
+    from django.urls import path
+    return i18n_patterns(path('news/', url_test_view))
+
+
+class I18nUrls(object):
+    urlpatterns = _i18n_urlpatterns()
+
+
+def _i18n_fragment_urlpatterns():
+    from django.urls import include, path
+    return _i18n_urlpatterns() + [
+        path('breadcrumbs/', include('url_breadcrumbs.urls'))]
+
+
+class I18nFragmentUrls(object):
+    urlpatterns = _i18n_fragment_urlpatterns()
+
+
+@override_settings(URL_BREADCRUMBS_I18N=True, URL_BREADCRUMBS_FUNCTIONS=None,
+                   ROOT_URLCONF=I18nUrls)
+class I18nTest(TestCase):
+
+    def setUp(self):
+        from unittest import mock
+        patcher = mock.patch('django.utils.translation.gettext',
+                             _fake_gettext)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _names(self, path, language):
+        from django.utils import translation
+        from url_breadcrumbs.trails import build_crumbs
+        with translation.override(language):
+            crumbs = build_crumbs({}, RequestFactory().get(path))
+        return [(crumb_path, name) for crumb_path, _, name in crumbs]
+
+    def test_names_translated_per_language(self):
+        self.assertEqual(
+            [('/', 'Home [en]'), ('/about-us', 'About Us [en]')],
+            self._names('/about-us', 'en'))
+        # Names cached for English are not reused for French
+        self.assertEqual(
+            [('/', 'Home [fr]'), ('/about-us', 'About Us [fr]')],
+            self._names('/about-us', 'fr'))
+        self.assertEqual(
+            [('/', 'Home [en]'), ('/about-us', 'About Us [en]')],
+            self._names('/about-us', 'en'))
+
+    def test_language_prefix_gets_no_crumb(self):
+        self.assertEqual(
+            [('/', 'Home [fr]'), ('/fr/news', 'News [fr]')],
+            self._names('/fr/news', 'fr'))
+        # Only a leading language code is a prefix
+        self.assertEqual(
+            [('/', 'Home [fr]'), ('/news', 'News [fr]'),
+             ('/news/fr', 'Fr [fr]')],
+            self._names('/news/fr', 'fr'))
+        with override_settings(URL_BREADCRUMBS_I18N=False):
+            self.assertEqual(
+                [('/', 'Home'), ('/fr', 'Fr'), ('/fr/news', 'News')],
+                self._names('/fr/news', 'fr'))
+
+    @override_settings(ROOT_URLCONF='url_breadcrumbs.tests')
+    def test_language_code_kept_without_i18n_patterns(self):
+        self.assertEqual(
+            [('/', 'Home [en]'), ('/my', 'My [en]'),
+             ('/my/account', 'Account [en]')],
+            self._names('/my/account', 'en'))
+
+    def test_trail_cache_keyed_by_language(self):
+        from django.utils import translation
+        with override_settings(URL_BREADCRUMBS_TRAIL_CACHE='memory'):
+            template = Template(
+                "{% load url_breadcrumbs_tags %}{% url_breadcrumbs request %}")
+            request = RequestFactory().get('/contact')
+            for language in ('en', 'fr', 'en'):
+                with translation.override(language):
+                    html = template.render(Context({'request': request}))
+                self.assertIn('Contact [%s]' % language, html)
+
+
+@override_settings(URL_BREADCRUMBS_FUNCTIONS=None)
+class TrailFingerprintTest(TestCase):
+
+    def test_fingerprint_covers_paths_names_and_delimiter(self):
+        from url_breadcrumbs.trails import build_crumbs, trail_fingerprint
+        crumbs = build_crumbs({}, RequestFactory().get('/a/b'))
+        fingerprint = trail_fingerprint(crumbs)
+        self.assertEqual(fingerprint, trail_fingerprint(
+            [('/', '/', 'Home'), ('/a', 'a', 'A'), ('/a/b', 'b', 'B')]))
+        self.assertNotEqual(fingerprint, trail_fingerprint(crumbs, '/'))
+        self.assertNotEqual(fingerprint, trail_fingerprint(
+            [('/', '/', 'Home'), ('/a', 'a', 'A'), ('/a/b', 'b', 'Bee')]))
+        self.assertNotEqual(fingerprint, trail_fingerprint(
+            [('/', '/', 'Home'), ('/a', 'a', 'A'), ('/a/c', 'c', 'B')]))
+
+    def test_conditional_get_skips_view(self):
+        from django.http import HttpResponse
+        from django.views.decorators.http import condition
+        from url_breadcrumbs.etag import fold_etag, trail_etag
+        calls = []
+
+        @condition(etag_func=trail_etag(lambda request: 'W/"v1"'))
+        def view(request):
+            calls.append(request.path)
+            return HttpResponse('page')
+
+        response = view(RequestFactory().get('/a/b'))
+        self.assertEqual(200, response.status_code)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"v1-'))
+        response = view(RequestFactory().get(
+            '/a/b', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(['/a/b'], calls)
+        # A different trail gives a different ETag
+        response = view(RequestFactory().get(
+            '/a/c', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('"x-f"', fold_etag('x', 'f'))
+
+
+@override_settings(ROOT_URLCONF='url_breadcrumbs.urls',
+                   URL_BREADCRUMBS_FUNCTIONS=None)
+class FragmentViewTest(TestCase):
+
+    def _render(self, tag_name, path):
+        template = Template(
+            "{%% load url_breadcrumbs_tags %%}{%% %s request %%}" % tag_name)
+        request = RequestFactory().get(path)
+        return template.render(Context({'request': request}))
+
+    def test_output_matches_tags(self):
+        response = self.client.get('/', {'path': '/about-us/team'})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(self._render('url_breadcrumbs', '/about-us/team'),
+                         response.content.decode('utf-8'))
+        self.assertEqual('public, max-age=300', response['Cache-Control'])
+        response = self.client.get('/json/', {'path': '/about-us/team'})
+        self.assertEqual('application/json', response['Content-Type'])
+        self.assertEqual(
+            self._render('url_breadcrumbs_json', '/about-us/team'),
+            response.content.decode('utf-8'))
+        response = self.client.get(
+            '/', {'path': '/about-us', 'format': 'jsonld'})
+        self.assertEqual(
+            self._render('url_breadcrumbs_jsonld', '/about-us'),
+            response.content.decode('utf-8'))
+
+    def test_headers_and_revalidation(self):
+        with override_settings(URL_BREADCRUMBS_I18N=True,
+                               URL_BREADCRUMBS_FRAGMENT_MAX_AGE=60):
+            response = self.client.get('/', {'path': '/news'})
+            self.assertEqual('public, max-age=60', response['Cache-Control'])
+            self.assertIn('Accept-Language', response['Vary'])
+            response = self.client.get(
+                '/', {'path': '/news'},
+                HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.content)
+
+    def test_etag_covers_template_version_and_host(self):
+        from unittest import mock
+        from url_breadcrumbs.templatetags import url_breadcrumbs_tags
+
+        def etag(format='html', **extra):
+            return self.client.get(
+                '/', {'path': '/news', 'format': format}, **extra)['ETag']
+
+        html_etag = etag()
+        with mock.patch.object(url_breadcrumbs_tags, '_template_digest',
+                               return_value='edited'):
+            self.assertNotEqual(html_etag, etag())
+        with override_settings(URL_BREADCRUMBS_HTML_CACHE_VERSION='r2'):
+            self.assertNotEqual(html_etag, etag())
+        with override_settings(ALLOWED_HOSTS=['a.test', 'b.test']):
+            self.assertNotEqual(etag('json', HTTP_HOST='a.test'),
+                                etag('json', HTTP_HOST='b.test'))
+            self.assertEqual(etag(HTTP_HOST='a.test'),
+                             etag(HTTP_HOST='b.test'))
+
+    @override_settings(URL_BREADCRUMBS_I18N=True,
+                       ROOT_URLCONF=I18nFragmentUrls)
+    def test_rendered_in_language_of_path(self):
+        from unittest import mock
+        from django.utils import translation
+        with mock.patch('django.utils.translation.gettext', _fake_gettext):
+            response = self.client.get(
+                '/breadcrumbs/', {'path': '/fr/news'},
+                HTTP_ACCEPT_LANGUAGE='en')
+            with translation.override('fr'):
+                html = self._render('url_breadcrumbs', '/fr/news')
+            self.assertEqual(html, response.content.decode('utf-8'))
+            self.assertIn('News [fr]', html)
+            self.assertFalse(response.has_header('Vary'))
+            # Paths without a language prefix use the request's language
+            response = self.client.get(
+                '/breadcrumbs/', {'path': '/about'},
+                HTTP_ACCEPT_LANGUAGE='fr')
+            self.assertIn('Accept-Language', response['Vary'])
+            self.assertIn('Cookie', response['Vary'])
+
+    def test_invalid_requests(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(400, self.client.get('/').status_code)
+            self.assertEqual(
+                400, self.client.get('/', {'path': 'news'}).status_code)
+            self.assertEqual(400, self.client.get(
+                '/', {'path': '/news', 'format': 'xml'}).status_code)
+            self.assertEqual(
+                405, self.client.post('/', {'path': '/news'}).status_code)
+            self.assertEqual(400, self.client.get(
+                '/', {'path': '/' + 'x' * 1024}).status_code)
+            self.assertEqual(400, self.client.get(
+                '/', {'path': '/a' * 17}).status_code)
+        self.assertEqual(
+            200, self.client.get('/', {'path': '/a' * 16}).status_code)
+
+
+class CoreTest(TestCase):
+
+    def test_import_without_django(self):
+        import subprocess
+        import sys
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys, url_breadcrumbs.core, url_breadcrumbs.crumb_fns;'
+            'print(sorted(m for m in sys.modules if m.startswith("django")))'
+        ])
+        self.assertEqual(b'[]', output.strip())
+
+    def test_build_trail_with_config(self):
+        from url_breadcrumbs.core import (
+            CrumbIndex, Humanizer, TrailConfig, build_trail, build_trails)
+
+        def shout(context, request, path_fragment, is_current_page):
+            return path_fragment.upper() if is_current_page else None
+
+        config = TrailConfig(
+            home_name='Start', crumb_functions=[shout],
+            crumb_index=CrumbIndex({'/en/faq-api': 'Help'}),
+            fallback=Humanizer(acronyms=['API']),
+            language_prefixes=['EN'])
+        self.assertEqual(
+            [('/', '/', 'Start'), ('/en/faq-api', 'faq-api', 'Help'),
+             ('/en/faq-api/rest-api', 'rest-api', 'Rest API'),
+             ('/en/faq-api/rest-api/v2', 'v2', 'V2')],
+            build_trail('/en/faq-api/rest-api/v2', config))
+        config.crumb_index = None
+        self.assertEqual(
+            [('/faq-api', (('/', '/', 'Start'),
+                           ('/faq-api', 'faq-api', 'FAQ-API')))],
+            list(build_trails(['/faq-api'], config)))
+        self.assertEqual(
+            [('/', '/', 'Start'), ('/a', 'a', 'A'), ('/a/b', 'b', 'None')],
+            build_trail('/a/b', config, crumb='None', crumbs={'a': 'A'}))
+
+    def test_io_bound_functions_see_context_variables(self):
+        import contextvars
+        from url_breadcrumbs.core import TrailConfig, build_trail, io_bound
+        site = contextvars.ContextVar('site')
+        calls = []
+
+        @io_bound
+        def site_fn(context, request, path_fragment, is_current_page):
+            return site.get('unset')
+
+        def pool_call(fn, *args):
+            calls.append(fn)
+            return fn(*args)
+
+        site.set('Museum')
+        config = TrailConfig(crumb_functions=[site_fn], pool_call=pool_call)
+        self.assertEqual(('/a', 'a', 'Museum'), build_trail('/a', config)[-1])
+        self.assertEqual([site_fn], calls)
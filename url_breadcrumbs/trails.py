@@ -0,0 +1,353 @@
+"""
+Building of breadcrumb trails, as used by the
+:mod:`url_breadcrumbs.templatetags.url_breadcrumbs_tags` template tag and
+outside of templates, for example to generate breadcrumbs for sitemaps,
+structured data or search indexes.
+
+These functions adapt the Django-independent engine in
+:mod:`url_breadcrumbs.core` to Django settings, adding cached and translated
+fallback names, instrumentation and signals. Code that runs without Django
+can use :mod:`url_breadcrumbs.core` directly.
+"""
+import asyncio
+import functools
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import translation
+
+from url_breadcrumbs import core, i18n, instrumentation, signals
+# Names of the core engine, importable from here as they always have been
+from url_breadcrumbs.core import (  # noqa
+    BudgetExceeded, Crumb, Item, Trail, TrailConfig, call_batched_functions,
+    call_crumb_functions, is_batched, is_io_bound, prefix_items,
+    submit_io_bound_functions, trail_fingerprint)
+from url_breadcrumbs.index import get_crumb_index
+from url_breadcrumbs.names import slug_to_name
+from url_breadcrumbs.pipeline import get_pipeline
+
+log = logging.getLogger(__name__)
+
+TRAIL_SETTINGS = (
+    'URL_BREADCRUMBS_TIME_BUDGET',
+    'URL_BREADCRUMBS_IO_WORKERS',
+    'URL_BREADCRUMBS_ASYNC_TIMEOUT',
+)
+
+# Trail settings, read once by configure() rather than for every trail
+_time_budget = None
+_io_workers = 8
+_async_timeout = None
+
+
+def configure():
+    """Read the trail building settings from Django settings."""
+    global _time_budget, _io_workers, _async_timeout
+    _time_budget = getattr(settings, 'URL_BREADCRUMBS_TIME_BUDGET', None)
+    _io_workers = getattr(settings, 'URL_BREADCRUMBS_IO_WORKERS', 8)
+    _async_timeout = getattr(settings, 'URL_BREADCRUMBS_ASYNC_TIMEOUT', None)
+
+
+def setting_changed_receiver(setting, **kwargs):
+    if setting in TRAIL_SETTINGS:
+        configure()
+
+
+def get_executor():
+    """
+    Return the thread pool shared by all I/O-bound crumb name functions,
+    with up to ``URL_BREADCRUMBS_IO_WORKERS`` threads (default 8).
+    """
+    return core.get_executor(_io_workers)
+
+
+def get_trail_config(crumb_home_name='Home', crumb_functions=None,
+                     crumb_index=None, time_budget=None):
+    """
+    Return a :class:`~url_breadcrumbs.core.TrailConfig` for the
+    ``URL_BREADCRUMBS_*`` Django settings.
+
+    ``crumb_functions``, ``crumb_index`` and ``time_budget`` default to the
+    ``URL_BREADCRUMBS_FUNCTIONS``, ``URL_BREADCRUMBS_INDEX`` and
+    ``URL_BREADCRUMBS_TIME_BUDGET`` settings. Fallback names come from
+    :func:`~url_breadcrumbs.names.slug_to_name`, and the Home crumb name is
+    translated if translation is enabled, see :mod:`url_breadcrumbs.i18n`.
+    """
+    if crumb_functions is None:
+        crumb_functions = get_pipeline()
+    if crumb_index is None:
+        crumb_index = get_crumb_index()
+    if time_budget is None:
+        time_budget = _time_budget
+    pool_call = None
+    if any(map(core.is_io_bound, crumb_functions)):
+        # Pool threads call functions in the caller's active language
+        pool_call = functools.partial(
+            _call_in_pool, translation.get_language())
+    on_win = on_degraded = None
+    if instrumentation.enabled:
+        crumb_functions = instrumentation.instrument(crumb_functions)
+        on_win = instrumentation.record_win
+        on_degraded = instrumentation.record_degraded
+    return TrailConfig(
+        home_name=i18n.gettext(crumb_home_name),
+        crumb_functions=crumb_functions,
+        crumb_index=crumb_index,
+        fallback=slug_to_name,
+        time_budget=time_budget,
+        io_workers=_io_workers,
+        pool_call=pool_call,
+        language_prefixes=i18n.get_language_prefixes(),
+        on_win=on_win,
+        on_degraded=on_degraded,
+    )
+
+
+def name_crumbs(crumb_functions, context, request, items, deadline=None,
+                degraded=None):
+    """
+    Return the crumb name for each ``(crumb_path, path_fragment,
+    is_current_page)`` tuple in ``items``, from ``crumb_functions`` or else
+    by converting the path fragment to title case, see
+    :func:`url_breadcrumbs.core.name_crumbs`.
+    """
+    return core.name_crumbs(get_trail_config(crumb_functions=crumb_functions),
+                            context, request, items, deadline, degraded)
+
+
+def _request_overrides(request):
+    overrides = {}
+    if hasattr(request, 'crumb'):
+        overrides['crumb'] = request.crumb
+    if hasattr(request, 'crumbs'):
+        overrides['crumbs'] = request.crumbs
+    return overrides
+
+
+def split_trail(request, crumb_index=None):
+    """
+    Split the path of ``request`` into the items of its breadcrumb trail,
+    with names set by ``request.crumb``, ``request.crumbs`` or
+    ``crumb_index``, see :func:`url_breadcrumbs.core.split_trail`.
+    """
+    return core.split_trail(
+        request.path, crumb_index,
+        language_prefixes=i18n.get_path_language_prefixes(request.path),
+        **_request_overrides(request))
+
+
+def join_trail(crumb_home_name, items, names):
+    """
+    Return the :class:`Trail` of crumbs for named ``items``, see
+    :func:`url_breadcrumbs.core.join_trail`. The Home crumb name is
+    translated if translation is enabled, see :mod:`url_breadcrumbs.i18n`.
+    """
+    return core.join_trail(i18n.gettext(crumb_home_name), items, names)
+
+
+def build_crumbs(context, request, crumb_home_name='Home',
+                 crumb_functions=None, crumb_index=None, time_budget=None):
+    """
+    Return the :class:`Trail` of ``(crumb_path, path_fragment, crumb_name)``
+    crumbs for the breadcrumb trail of ``request``, see
+    :func:`~url_breadcrumbs.templatetags.url_breadcrumbs_tags.url_breadcrumbs`.
+
+    ``crumb_functions`` and ``crumb_index`` default to those configured by
+    the ``URL_BREADCRUMBS_FUNCTIONS`` and ``URL_BREADCRUMBS_INDEX`` settings.
+
+    ``time_budget`` is the number of seconds crumb functions may take to name
+    the whole trail, defaulting to the ``URL_BREADCRUMBS_TIME_BUDGET``
+    setting or no limit. Crumbs not named in time fall back to their
+    title-cased path fragment, the trail is marked as ``degraded`` and the
+    :data:`~url_breadcrumbs.signals.trail_degraded` signal is sent.
+    """
+    start = time.perf_counter() if instrumentation.enabled else None
+    config = get_trail_config(
+        crumb_home_name, crumb_functions, crumb_index, time_budget)
+    config.language_prefixes = i18n.get_path_language_prefixes(request.path)
+    degraded = []
+    crumbs = core.build_trail(request.path, config, context, request,
+                              degraded=degraded, **_request_overrides(request))
+    if degraded:
+        if instrumentation.enabled:
+            instrumentation.record_degraded()
+        signals.trail_degraded.send(
+            sender=None, path=request.path, crumb_paths=degraded)
+    if start is not None:
+        instrumentation.record_trail(
+            request.path, time.perf_counter() - start)
+    return crumbs
+
+
+def is_async(fn):
+    return (asyncio.iscoroutinefunction(fn) or
+            asyncio.iscoroutinefunction(getattr(fn, '__call__', None)))
+
+
+def _call_in_thread(fn, *args):
+    # Pool threads outlive requests, so close the database connections that
+    # crumb functions open in them once they are too old to reuse
+    close_old_connections()
+    try:
+        return fn(*args)
+    finally:
+        close_old_connections()
+
+
+def _call_in_pool(language, fn, *args):
+    # asgiref hides the active language from threads it was not activated
+    # in, even with a copy of the caller's context, so activate it again
+    with translation.override(language):
+        return _call_in_thread(fn, *args)
+
+
+async def _acall(fn, timeout, *args):
+    # Await coroutine functions, run synchronous functions in a thread with
+    # the caller's context variables, such as the active language. A
+    # synchronous function that times out carries on running in its thread,
+    # but its result is ignored.
+    if is_async(fn):
+        awaitable = fn(*args)
+    else:
+        awaitable = sync_to_async(_call_in_thread, thread_sensitive=False)(
+            fn, *args)
+    return await asyncio.wait_for(awaitable, timeout)
+
+
+async def aname_crumbs(crumb_functions, context, request, items,
+                       timeout=None):
+    """
+    Asynchronous version of :func:`name_crumbs`, which names all ``items``
+    concurrently.
+
+    Coroutine functions are awaited and synchronous functions are run in a
+    thread executor. Functions are still consulted in order for each item,
+    but items are named concurrently. If a function takes longer than
+    ``timeout`` seconds the item falls back to its title-cased path fragment;
+    batched functions that time out are ignored.
+    """
+    if instrumentation.enabled:
+        crumb_functions = instrumentation.instrument(crumb_functions)
+    batched_fns = [fn for fn in crumb_functions if is_batched(fn)]
+
+    async def call_batched(fn):
+        try:
+            return await _acall(fn, timeout, context, request, items) or {}
+        except asyncio.TimeoutError:
+            log.warn("Batched crumb generation function %s timed out" % fn)
+        except Exception:
+            log.warn("Batched crumb generation function %s failed"
+                     % fn, exc_info=True)
+        return None
+
+    results = await asyncio.gather(*[call_batched(fn) for fn in batched_fns])
+    batch_results = dict(
+        (fn, result) for fn, result in zip(batched_fns, results)
+        if result is not None)
+
+    async def name_item(item):
+        crumb_path, path_fragment, is_current_page = item
+        for fn in crumb_functions:
+            if is_batched(fn):
+                crumb_name = batch_results.get(fn, {}).get(crumb_path)
+            else:
+                try:
+                    crumb_name = await _acall(
+                        fn, timeout, context, request, path_fragment,
+                        is_current_page)
+                except asyncio.TimeoutError:
+                    log.warn("Crumb generation function %s timed out" % fn)
+                    break
+                except Exception:
+                    # Error in crumb name generation function
+                    log.warn("Crumb generation function %s failed"
+                             % fn, exc_info=True)
+                    continue
+            if crumb_name is not None:
+                if instrumentation.enabled:
+                    instrumentation.record_win(fn)
+                return crumb_name
+        return slug_to_name(path_fragment)
+
+    return await asyncio.gather(*[name_item(item) for item in items])
+
+
+async def abuild_crumbs(context, request, crumb_home_name='Home',
+                        crumb_functions=None, crumb_index=None, timeout=None):
+    """
+    Asynchronous version of :func:`build_crumbs` for use in async views,
+    which names path fragments concurrently with :func:`aname_crumbs`.
+
+    ``timeout`` defaults to the ``URL_BREADCRUMBS_ASYNC_TIMEOUT`` setting, or
+    no timeout if that is not set.
+    """
+    start = time.perf_counter() if instrumentation.enabled else None
+    if crumb_functions is None:
+        crumb_functions = get_pipeline()
+    if crumb_index is None:
+        crumb_index = get_crumb_index()
+    if timeout is None:
+        timeout = _async_timeout
+    items, names, pending = split_trail(request, crumb_index)
+    if pending:
+        pending_names = await aname_crumbs(
+            crumb_functions, context, request, [items[i] for i in pending],
+            timeout=timeout)
+        for i, crumb_name in zip(pending, pending_names):
+            names[i] = crumb_name
+    crumbs = join_trail(crumb_home_name, items, names)
+    if start is not None:
+        instrumentation.record_trail(
+            request.path, time.perf_counter() - start)
+    return crumbs
+
+
+def build_trails(paths, crumb_home_name='Home', crumbs=None,
+                 crumb_functions=None, crumb_index=None, context=None,
+                 memo_size=10000, crumb=core._unset):
+    """
+    Generate the breadcrumb trail for each of ``paths`` without needing a
+    template context or request, see
+    :func:`url_breadcrumbs.core.build_trails`.
+
+    Yields a ``(path, trail)`` pair for each path, where ``trail`` is a tuple
+    of :class:`Crumb` objects as built by the ``url_breadcrumbs`` template
+    tag. Paths are consumed lazily, so very large
+    iterables of paths can be processed.
+
+    Names of ancestor crumbs are computed once and shared between paths with
+    a common prefix, so ``/a/b/c`` and ``/a/b/d`` name ``/a`` and ``/a/b``
+    only once. Up to ``memo_size`` crumb names are remembered.
+
+    Args:
+     - ``paths``: iterable of URL paths
+     - ``crumb_home_name`` (str): name of the root Home crumb
+     - ``crumbs`` (dict): maps path fragments to names, like
+       ``request.crumbs``; a name of ``None`` skips the crumb
+     - ``crumb_functions``: crumb name functions to call, defaults to those
+       in the ``URL_BREADCRUMBS_FUNCTIONS`` setting. Functions are called
+       with ``context`` and a ``request`` of ``None``.
+     - ``crumb_index`` (:class:`~url_breadcrumbs.index.CrumbIndex`): index
+       of path prefix names, defaults to the ``URL_BREADCRUMBS_INDEX``
+       setting
+     - ``context`` (dict): context passed to crumb name functions
+     - ``crumb`` (str): name of the crumb of each path's last fragment, like
+       ``request.crumb``; ``None`` skips the crumb
+    """
+    config = get_trail_config(crumb_home_name, crumb_functions, crumb_index)
+    # Offline trails are not limited by the per-request time budget
+    config.time_budget = None
+    trails = core.build_trails(
+        paths, config, crumbs, context, memo_size, crumb)
+    while True:
+        start = time.perf_counter() if instrumentation.enabled else None
+        try:
+            path, trail = next(trails)
+        except StopIteration:
+            return
+        if start is not None:
+            instrumentation.record_trail(path, time.perf_counter() - start)
+        yield path, trail
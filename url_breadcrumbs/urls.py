@@ -0,0 +1,17 @@
+"""
+URLconf of the breadcrumb fragment views, see :mod:`url_breadcrumbs.views`::
+
+    path('breadcrumbs/', include('url_breadcrumbs.urls')),
+"""
+from django.urls import path
+
+from url_breadcrumbs import views
+
+urlpatterns = [
+    path('', views.breadcrumbs_fragment,
+         name='url_breadcrumbs_fragment'),
+    path('json/', views.breadcrumbs_fragment, {'format': 'json'},
+         name='url_breadcrumbs_fragment_json'),
+    path('jsonld/', views.breadcrumbs_fragment, {'format': 'jsonld'},
+         name='url_breadcrumbs_fragment_jsonld'),
+]
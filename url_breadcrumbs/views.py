@@ -0,0 +1,161 @@
+"""
+Views serving the breadcrumb trail of any path on its own, so it can be
+cached separately from the pages showing it, for example as an edge side
+include (ESI) fragment::
+
+    # urls.py
+    path('breadcrumbs/', include('url_breadcrumbs.urls')),
+
+    <!-- In the page template, cached with the page -->
+    <esi:include src="/breadcrumbs/?path={{ request.path|urlencode }}"/>
+
+Responses are exactly what the template tags would render for a request to
+``path``, and carry ``Cache-Control``, ``Vary`` and ``ETag`` headers so
+caches can keep them for their own lifetime, see :func:`breadcrumbs_fragment`.
+"""
+import contextlib
+import copy
+import hashlib
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.template import Context, Template
+from django.utils import translation
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers)
+from django.views.decorators.http import require_safe
+
+from url_breadcrumbs import __version__, i18n
+from url_breadcrumbs.middleware import LazyBreadcrumbs
+
+# Template tag and content type of each output format
+FORMATS = {
+    'html': ('url_breadcrumbs', 'text/html; charset=utf-8'),
+    'json': ('url_breadcrumbs_json', 'application/json'),
+    'jsonld': ('url_breadcrumbs_jsonld', 'text/html; charset=utf-8'),
+}
+
+# Limits on the ``path`` parameter, so anonymous requests can't make
+# arbitrarily long trails
+DEFAULT_MAX_PATH_LENGTH = 1024
+DEFAULT_MAX_DEPTH = 16
+
+_templates = {}
+
+
+def _get_template(tag_name):
+    tmpl = _templates.get(tag_name)
+    if tmpl is None:
+        tmpl = _templates[tag_name] = Template(
+            '{%% load url_breadcrumbs_tags %%}{%% %s request %%}' % tag_name)
+    return tmpl
+
+
+def fragment_request(request, path):
+    """
+    Return a copy of ``request`` for ``path``, without any crumb names set on
+    ``request`` itself, and with its own ``breadcrumbs`` so the trail is
+    built once for the ETag and the response.
+    """
+    fragment = copy.copy(request)
+    fragment.path = fragment.path_info = path
+    for attr in ('crumb', 'crumbs'):
+        fragment.__dict__.pop(attr, None)
+    fragment.breadcrumbs = LazyBreadcrumbs(fragment)
+    return fragment
+
+
+def fragment_etag(fragment, format, context):
+    """
+    Return the ETag of the ``format`` output for the ``fragment`` request
+    rendered in the template ``context``: a digest of the trail fingerprint
+    and of everything else the output depends on, namely this package's
+    version, the ``URL_BREADCRUMBS_HTML_CACHE_VERSION`` setting, the
+    renderer and template source for HTML, and the host of absolute URLs for
+    JSON.
+    """
+    from url_breadcrumbs.templatetags import url_breadcrumbs_tags as tags
+    digest = hashlib.md5(usedforsecurity=False)
+    parts = [__version__,
+             str(getattr(settings, 'URL_BREADCRUMBS_HTML_CACHE_VERSION',
+                         None) or ''),
+             fragment.breadcrumbs.fingerprint(context=context)]
+    if format == 'html':
+        renderer = getattr(settings, 'URL_BREADCRUMBS_RENDERER', 'template')
+        parts.append(renderer)
+        if renderer == 'template':
+            engine = _get_template(FORMATS[format][0]).engine
+            parts.append(tags._template_digest(
+                engine.get_template(tags.TEMPLATE_NAME)))
+    else:
+        parts.append(fragment.build_absolute_uri('/'))
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return '"%s-%s"' % (format, digest.hexdigest())
+
+
+@require_safe
+def breadcrumbs_fragment(request, format='html'):
+    """
+    Return the breadcrumb trail of the path in the ``path`` query parameter,
+    rendered as by the ``url_breadcrumbs`` template tag for ``format``
+    ``'html'``, the ``url_breadcrumbs_json`` tag for ``'json'`` or the
+    ``url_breadcrumbs_jsonld`` tag for ``'jsonld'``. ``format`` may also be
+    given as a query parameter.
+
+    Paths longer than ``URL_BREADCRUMBS_FRAGMENT_MAX_PATH_LENGTH``
+    characters, 1024 by default, or with more than
+    ``URL_BREADCRUMBS_FRAGMENT_MAX_DEPTH`` fragments, 16 by default, are
+    rejected.
+
+    If translation is enabled and ``path`` starts with the language prefix
+    of :func:`~django.conf.urls.i18n.i18n_patterns`, the trail is rendered
+    in that language, as it is on the page at ``path``.
+
+    Responses are public and may be cached for
+    ``URL_BREADCRUMBS_FRAGMENT_MAX_AGE`` seconds, 300 by default. If
+    translation is enabled and the language is not given by ``path``, they
+    vary by ``Accept-Language`` and ``Cookie``, from which the request's
+    language may have been chosen. Their ETag changes with
+    the trail, template, version and host, see :func:`fragment_etag`, so
+    revalidation returns ``304 Not Modified`` without rendering.
+    """
+    path = request.GET.get('path', '')
+    format = request.GET.get('format', format)
+    if not path.startswith('/') or format not in FORMATS:
+        return HttpResponseBadRequest(
+            'Expected an absolute path and a format of %s'
+            % ', '.join(sorted(FORMATS)))
+    path = path.split('?', 1)[0]
+    max_length = getattr(settings, 'URL_BREADCRUMBS_FRAGMENT_MAX_PATH_LENGTH',
+                         DEFAULT_MAX_PATH_LENGTH)
+    max_depth = getattr(settings, 'URL_BREADCRUMBS_FRAGMENT_MAX_DEPTH',
+                        DEFAULT_MAX_DEPTH)
+    if (len(path) > max_length or
+            sum(1 for p in path.split('/') if p) > max_depth):
+        return HttpResponseBadRequest(
+            'Expected a path of at most %d characters and %d fragments'
+            % (max_length, max_depth))
+    language = None
+    if i18n.prefix_patterns_used():
+        language = translation.get_language_from_path(path)
+    fragment = fragment_request(request, path)
+    tag_name, content_type = FORMATS[format]
+    # Render in the language of the page at path, if it has one
+    with (translation.override(language) if language is not None
+          else contextlib.nullcontext()):
+        # Build the trail for the ETag with the context it is rendered in
+        context = Context({'request': fragment})
+        etag = fragment_etag(fragment, format, context)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(_get_template(tag_name).render(context),
+                                    content_type=content_type)
+            response['ETag'] = etag
+    patch_cache_control(
+        response, public=True, max_age=getattr(
+            settings, 'URL_BREADCRUMBS_FRAGMENT_MAX_AGE', 300))
+    if i18n.enabled and language is None:
+        patch_vary_headers(response, ['Accept-Language', 'Cookie'])
+    return response
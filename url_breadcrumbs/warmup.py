@@ -0,0 +1,149 @@
+"""
+Pre-population of breadcrumb caches, used by the ``warm_breadcrumbs``
+management command.
+
+Warming builds the trail, and renders the HTML, of each path as the
+``url_breadcrumbs`` template tag would, which fills whichever trail, HTML and
+crumb name caches are configured. Caches held in process memory are only
+warmed in the process doing the warming, so warm shared caches, such as
+Django cache aliases backed by memcached or files, from a separate command,
+see :func:`shared_caches`.
+"""
+import itertools
+import logging
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+from xml.etree import ElementTree
+
+log = logging.getLogger(__name__)
+
+# Request line of a common or combined format access log entry
+re_log_request = re.compile(r'"(?:GET|HEAD) (\S+) HTTP/[\d.]+"')
+
+
+def read_paths(lines, format='auto'):
+    """
+    Yield the unique URL paths found in ``lines`` of a URL list, sitemap or
+    access log, in the order they are first found.
+
+    ``format`` is one of ``'urls'``, ``'sitemap'``, ``'log'`` or ``'auto'``
+    to detect the format from the content.
+    """
+    lines = iter(lines)
+    if format == 'auto':
+        first = next(lines, '')
+        if first.lstrip().startswith('<'):
+            format = 'sitemap'
+        elif re_log_request.search(first):
+            format = 'log'
+        else:
+            format = 'urls'
+        lines = itertools.chain([first], lines)
+    if format == 'sitemap':
+        urls = _sitemap_urls(''.join(lines))
+    elif format == 'log':
+        urls = (match.group(1) for match in map(re_log_request.search, lines)
+                if match)
+    elif format == 'urls':
+        urls = (line.strip() for line in lines)
+    else:
+        raise ValueError("Unknown format %r" % format)
+    seen = set()
+    for url in urls:
+        if not url or url.startswith('#'):
+            continue
+        path = unquote(urlsplit(url).path) or '/'
+        if path not in seen:
+            seen.add(path)
+            yield path
+
+
+def _sitemap_urls(xml):
+    for element in ElementTree.fromstring(xml).iter():
+        if element.tag.rsplit('}', 1)[-1] == 'loc' and element.text:
+            yield element.text.strip()
+
+
+def _is_process_local(backend):
+    if backend == 'memory':
+        return True
+    from django.core.cache import caches
+    from django.core.cache.backends.locmem import LocMemCache
+    return isinstance(caches[backend], LocMemCache)
+
+
+def shared_caches():
+    """
+    Return the names of the ``URL_BREADCRUMBS_TRAIL_CACHE`` and
+    ``URL_BREADCRUMBS_HTML_CACHE`` settings that configure a cache shared
+    between processes, which outlives the warming process.
+    """
+    from django.conf import settings
+    shared = []
+    for setting in ('URL_BREADCRUMBS_TRAIL_CACHE',
+                    'URL_BREADCRUMBS_HTML_CACHE'):
+        backend = getattr(settings, setting, None)
+        if backend is not None and not _is_process_local(backend):
+            shared.append(setting)
+    return shared
+
+
+def warm_path(path):
+    """
+    Build and render the breadcrumbs of ``path``. Returns ``True`` if the
+    trail could be stored in the trail cache.
+    """
+    from django.template import Context
+    from django.test.client import RequestFactory
+    from url_breadcrumbs.templatetags import url_breadcrumbs_tags as tags
+
+    request = RequestFactory().get(path)
+    context = Context({'request': request})
+    tags.render_crumbs(context, tags.url_breadcrumbs(context, request))
+    return (tags.get_trail_cache() is not None and
+            tags._is_trail_cacheable(request))
+
+
+def _setup_process():
+    # Processes that are spawned rather than forked start without Django
+    # configured, from the DJANGO_SETTINGS_MODULE environment variable
+    import django
+    django.setup()
+
+
+def warm(paths, workers=4, processes=False, mp_context=None):
+    """
+    Warm caches for ``paths`` with a pool of ``workers`` threads, or
+    processes if ``processes`` is true. Returns a dict with the number of
+    ``paths`` warmed, number of ``trails`` cached, ``errors`` and
+    ``seconds`` taken. Each error is logged.
+
+    Processes are started with the :mod:`multiprocessing` context
+    ``mp_context``, or the default start method, and set up Django before
+    warming.
+    """
+    if processes:
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=mp_context,
+            initializer=_setup_process)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    stats = {'paths': 0, 'trails': 0, 'errors': 0}
+    start = time.perf_counter()
+    with executor:
+        futures = [(path, executor.submit(warm_path, path))
+                   for path in paths]
+        for path, future in futures:
+            try:
+                trail_cached = future.result()
+            except Exception:
+                log.warn("Could not warm breadcrumbs of %s" % path,
+                         exc_info=True)
+                stats['errors'] += 1
+                continue
+            stats['paths'] += 1
+            stats['trails'] += int(trail_cached)
+    stats['seconds'] = time.perf_counter() - start
+    return stats